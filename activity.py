@@ -0,0 +1,73 @@
+from heapq import heappush, heappop
+from math import hypot
+from settings import *
+
+
+class EnemyActivity:
+    def __init__(self, interval=SLEEP_ANIMATION_INTERVAL):
+        self.frame = 0
+        self.interval = interval
+
+        # sleeping enemies with the frame they were last updated for
+        self.sleeping = {}
+        self.slots = [{} for _ in range(interval)]
+        self.count = 0
+
+        # the player can not get closer to a sleeper than its distance
+        # minus how far the player travelled since, even when teleported
+        self.travel = 0.0
+        self.player_pos = None
+        self.heap = []
+
+    def wake_radius(self, enemy):
+        return max(enemy.notice_radius, enemy.attack_radius)
+
+    def can_sleep(self, enemy, player):
+        if enemy.status != 'idle' or not enemy.vulnerable or not enemy.can_attack:
+            return False
+        x, y = enemy.rect.center
+        player_x, player_y = player.rect.center
+        radius = self.wake_radius(enemy)
+        return (player_x - x) ** 2 + (player_y - y) ** 2 > radius ** 2
+
+    def sleep(self, enemy, player):
+        x, y = enemy.rect.center
+        player_x, player_y = player.rect.center
+        distance = hypot(player_x - x, player_y - y)
+
+        # a pixel of slack covers the rounding of the travelled distance
+        wake_travel = self.travel + distance - self.wake_radius(enemy) - 1
+        self.count += 1
+        slot = self.slots[self.count % self.interval]
+        slot[enemy] = None
+        self.sleeping[enemy] = [self.frame, slot, self.count]
+        heappush(self.heap, (wake_travel, self.count, enemy))
+
+    def wake(self, enemy):
+        synced, slot, _ = self.sleeping.pop(enemy)
+        del slot[enemy]
+        enemy.skip_frames(self.frame - synced)
+
+    def forget(self, enemy):
+        synced, slot, _ = self.sleeping.pop(enemy)
+        del slot[enemy]
+
+    def tick(self):
+        # sleepers are animated a few at a time at a lower rate
+        self.frame += 1
+        for enemy, state in ((enemy, self.sleeping[enemy]) for enemy in self.slots[self.frame % self.interval]):
+            enemy.skip_frames(self.frame - state[0])
+            state[0] = self.frame
+
+    def due(self, player):
+        position = player.rect.center
+        if self.player_pos is not None:
+            self.travel += hypot(position[0] - self.player_pos[0], position[1] - self.player_pos[1])
+        self.player_pos = position
+
+        woken = []
+        while self.heap and self.heap[0][0] <= self.travel:
+            _, count, enemy = heappop(self.heap)
+            if enemy in self.sleeping and self.sleeping[enemy][2] == count:
+                woken.append(enemy)
+        return woken
@@ -0,0 +1,206 @@
+import os
+import pygame
+from os.path import normpath
+from time import perf_counter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from settings import *
+from support import import_folder
+from atlas import Atlas, read_page
+
+
+class AssetCache:
+    def __init__(self, max_entries=None):
+
+        # the entries are kept in least recently used order
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # files decoded ahead of time on a thread pool, oldest first, and where the startup went
+        self.decoder = None
+        self.decoded = OrderedDict()
+        self.groups = {}
+
+        # frames packed by atlas.py, read the first time an image is asked for
+        self.atlas = None
+
+    def get(self, key, loader):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        asset = loader()
+        self.entries[key] = asset
+        if self.max_entries is not None:
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return asset
+
+    def group(self, path):
+        # the folder under graphics or audio an asset belongs to
+        parts = normpath(path).split(os.sep)
+        end = len(parts) - 1 if os.path.splitext(parts[-1])[1] else len(parts)
+        for root in ('graphics', 'audio'):
+            if root in parts:
+                index = parts.index(root)
+                return '/'.join(parts[index:min(index + 2, end)])
+        return parts[0]
+
+    def count(self, path, files, started):
+        entry = self.groups.setdefault(self.group(path), {'files': 0, 'ms': 0.0, 'decode_ms': 0.0})
+        entry['files'] += files
+        entry['ms'] += (perf_counter() - started) * 1000
+
+    def preload(self, paths, workers=ASSET_LOAD_WORKERS):
+        # images are decoded in the background, converting them still needs
+        # the display and happens on the main thread when they are asked for
+        if not workers:
+            return
+        if self.decoder is None:
+            self.decoder = ThreadPoolExecutor(workers)
+        for path in paths:
+            files = [path]
+            if os.path.isdir(path):
+                files = [os.path.join(folder, name) for folder, _, names in os.walk(path) for name in sorted(names) if name.endswith('.png')]
+            for file in files:
+                file = normpath(self.atlas_page(file) or file)
+                if file not in self.decoded:
+                    self.decoded[file] = self.decoder.submit(self.decode, file)
+
+        # decodes nothing asked for yet are held to the same limit as the entries
+        if self.max_entries is not None:
+            while len(self.decoded) > self.max_entries:
+                self.decoded.popitem(last=False)[1].cancel()
+                self.evictions += 1
+
+    def decode(self, path):
+        started = perf_counter()
+        surface = read_page(path) if path.endswith('.page') else pygame.image.load(path)
+        return surface, (perf_counter() - started) * 1000
+
+    def load(self, path):
+        future = self.decoded.pop(normpath(path), None)
+        if future is None:
+            return read_page(path) if path.endswith('.page') else pygame.image.load(path)
+        surface, decode_ms = future.result()
+        self.groups.setdefault(self.group(path), {'files': 0, 'ms': 0.0, 'decode_ms': 0.0})['decode_ms'] += decode_ms
+        return surface
+
+    def use_atlas(self):
+        if not USE_ATLAS:
+            return None
+        if self.atlas is None:
+            self.atlas = Atlas()
+        return self.atlas
+
+    def atlas_page(self, path):
+        atlas = self.use_atlas()
+        return atlas.page_path(path) if atlas else None
+
+    def atlas_frame(self, path):
+        # a frame of an atlas page, None when the page is missing or out of date
+        page_path = self.atlas_page(path)
+        if page_path is None:
+            return None
+        page = self.get(('atlas', normpath(page_path)), lambda: self.load(page_path).convert_alpha())
+        return page.subsurface(self.atlas.rect(path))
+
+    def folder(self, path):
+        path = normpath(path)
+
+        def load():
+            started = perf_counter()
+            atlas = self.use_atlas()
+            files = atlas.folder_files(path) if atlas else None
+            frames = [self.atlas_frame(file) for file in files] if files else None
+            if frames is None or None in frames:
+                frames = import_folder(path, self.load)
+            self.count(path, len(frames), started)
+            return frames
+
+        return self.get(('folder', path), load)
+
+    def flipped(self, path, flip_x=True, flip_y=False):
+        # mirrored frames of a folder, made once
+        path = normpath(path)
+        return self.get(('flipped', path, flip_x, flip_y), lambda: [pygame.transform.flip(frame, flip_x, flip_y) for frame in self.folder(path)])
+
+    def image(self, path, alpha=True):
+        path = normpath(path)
+
+        def load():
+            started = perf_counter()
+            surface = self.atlas_frame(path) if alpha else None
+            if surface is None:
+                surface = self.load(path)
+                surface = surface.convert_alpha() if alpha else surface.convert()
+            self.count(path, 1, started)
+            return surface
+
+        return self.get(('image', path, alpha), load)
+
+    def sound(self, path, volume=None):
+        path = normpath(path)
+
+        def load():
+            started = perf_counter()
+            sound = pygame.mixer.Sound(path)
+            if volume is not None:
+                sound.set_volume(volume)
+            self.count(path, 1, started)
+            return sound
+
+        return self.get(('sound', path, volume), load)
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions}
+
+    def report(self):
+        # main thread time per asset group, and the decoding done for it in the background
+        groups = {group: {key: round(value, 2) for key, value in entry.items()} for group, entry in sorted(self.groups.items())}
+        return {
+            'groups': groups,
+            'ms': round(sum(entry['ms'] for entry in self.groups.values()), 2),
+            'decode_ms': round(sum(entry['decode_ms'] for entry in self.groups.values()), 2),
+            'pending': len(self.decoded)}
+
+    def clear(self):
+        self.entries.clear()
+        for future in self.decoded.values():
+            future.cancel()
+        self.decoded.clear()
+
+
+class TextCache:
+    def __init__(self, font, max_entries=TEXT_CACHE_SIZE):
+        self.font = font
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+
+    def render(self, text, color):
+        # rendered strings are kept by text and color, least recently used first
+        key = (text, color)
+        if key in self.surfaces:
+            self.surfaces.move_to_end(key)
+            return self.surfaces[key]
+
+        surface = self.font.render(text, False, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+assets = AssetCache(ASSET_CACHE_SIZE)
@@ -0,0 +1,172 @@
+import os
+import json
+import zlib
+import struct
+from os.path import normpath
+import pygame
+from settings import *
+
+# file layout: a manifest of where every frame is and one file per page,
+# a header then the pixels, stored as they are unless a compression level is set
+MANIFEST = 'manifest.json'
+PAGE_HEADER = struct.Struct('=4sIIII')
+MAGIC = b'ZATL'
+VERSION = 1
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def write_page(path, surface, compression=ATLAS_COMPRESSION):
+    pixels = pygame.image.tobytes(surface, 'RGBA')
+    with open(path, 'wb') as page:
+        page.write(PAGE_HEADER.pack(MAGIC, VERSION, *surface.get_size(), compression))
+        page.write(zlib.compress(pixels, compression) if compression else pixels)
+
+
+def read_page(path):
+    with open(path, 'rb') as page:
+        magic, version, width, height, compression = PAGE_HEADER.unpack(page.read(PAGE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise pygame.error(f'{path} is not an atlas page')
+        pixels = page.read()
+
+    # the surface only lives until it is converted, so it can share the bytes
+    if compression:
+        pixels = zlib.decompress(pixels)
+    return pygame.image.frombuffer(pixels, (width, height), 'RGBA')
+
+
+def collect(group):
+    # every png of a group, and the folders import_folder would read them from
+    folders = {}
+    files = []
+    for folder, subfolders, names in os.walk(os.path.join(ATLAS_SOURCE, group)):
+        names = sorted(names)
+        paths = [normpath(os.path.join(folder, name)) for name in names]
+        files += [path for path in paths if path.endswith('.png')]
+        if names and not subfolders and all(path.endswith('.png') for path in paths):
+            folders[normpath(folder)] = paths
+    return folders, files
+
+
+def pack(sizes, page_size=ATLAS_PAGE_SIZE, padding=ATLAS_PADDING):
+    # shelves of frames, the tallest first, a new page when one is full
+    placements = {}
+    order = sorted(sizes, key=lambda path: (-sizes[path][1], -sizes[path][0], path))
+    page = 0
+    x = y = shelf_height = 0
+    for path in order:
+        width, height = sizes[path]
+        if x + width > page_size:
+            x = 0
+            y += shelf_height + padding
+            shelf_height = 0
+        if y + height > page_size:
+            page += 1
+            x = y = shelf_height = 0
+        placements[path] = (page, x, y, width, height)
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+    return placements
+
+
+def sets_of(groups, split=ATLAS_SPLIT_GROUPS):
+    # a split group is packed one subfolder at a time, so loading one set
+    # only decodes the pages of that set
+    sets = []
+    for group in groups:
+        if group in split:
+            folder = os.path.join(ATLAS_SOURCE, group)
+            sets += [f'{group}/{name}' for name in sorted(os.listdir(folder)) if os.path.isdir(os.path.join(folder, name))]
+        else:
+            sets.append(group)
+    return sets
+
+
+def build(groups=ATLAS_GROUPS, target=ATLAS_FOLDER):
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    os.makedirs(target, exist_ok=True)
+    for name in os.listdir(target):
+        if name.endswith('.page') or name == MANIFEST:
+            os.remove(os.path.join(target, name))
+
+    manifest = {'version': VERSION, 'pages': [], 'folders': {}, 'frames': {}}
+    for group in sets_of(groups):
+        folders, files = collect(group)
+        images = {path: pygame.image.load(path).convert_alpha() for path in files}
+        placements = pack({path: image.get_size() for path, image in images.items()})
+
+        # the pages are cut to what they use
+        page_count = max((placement[0] for placement in placements.values()), default=-1) + 1
+        first_page = len(manifest['pages'])
+        for index in range(page_count):
+            used = [placement for placement in placements.values() if placement[0] == index]
+            width = max(x + w for _, x, _, w, _ in used)
+            height = max(y + h for _, _, y, _, h in used)
+            page = pygame.Surface((width, height), pygame.SRCALPHA)
+            for path, (page_index, x, y, w, h) in placements.items():
+                if page_index == index:
+                    # a max blend over the empty page copies the pixels as they are
+                    page.blit(images[path], (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+            name = f'{group.replace("/", "_")}_{index}.page'
+            write_page(os.path.join(target, name), page)
+            manifest['pages'].append(name)
+
+        manifest['folders'].update(folders)
+        for path, (page_index, x, y, w, h) in placements.items():
+            manifest['frames'][path] = [first_page + page_index, x, y, w, h] + source_stamp(path)
+
+    with open(os.path.join(target, MANIFEST), 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    return manifest
+
+
+class Atlas:
+    def __init__(self, folder=ATLAS_FOLDER):
+        self.folder = folder
+        self.manifest = None
+        path = os.path.join(folder, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get('version') == VERSION:
+                self.manifest = manifest
+
+    def page_path(self, path):
+        # the page a frame is packed in, None when it is missing or its source changed
+        entry = self.manifest['frames'].get(normpath(path)) if self.manifest else None
+        if entry is None:
+            return None
+        try:
+            if source_stamp(path) != entry[5:]:
+                return None
+        except OSError:
+            return None
+        return os.path.join(self.folder, self.manifest['pages'][entry[0]])
+
+    def rect(self, path):
+        return pygame.Rect(self.manifest['frames'][normpath(path)][1:5])
+
+    def folder_files(self, path):
+        # the files of a folder when the folder still holds exactly those
+        files = self.manifest['folders'].get(normpath(path)) if self.manifest else None
+        if files is None:
+            return None
+        try:
+            names = sorted(os.listdir(path))
+        except OSError:
+            return None
+        if [normpath(os.path.join(path, name)) for name in names] != files:
+            return None
+        return files
+
+
+if __name__ == '__main__':
+    # packing needs the display to convert the frames, but never a window
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    manifest = build()
+    print(f'{len(manifest["frames"])} frames packed into {len(manifest["pages"])} pages in {ATLAS_FOLDER}')
@@ -0,0 +1,352 @@
+import os
+import csv
+import sys
+import json
+import random
+import argparse
+from math import cos, sin, pi, ceil
+from itertools import product
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+
+# headless picks the dummy drivers and hides the banner before pygame is imported,
+# the summary may go to stdout
+from headless import HeadlessGame
+import pygame
+from settings import *
+import controls
+from benchmark import percentile
+from pathfinding import FlowField
+
+# tables a variation can change, the player ones belong to the new player of every fight
+SETTING_TABLES = {'monster_data': monster_data, 'weapon_data': weapon_data, 'magic_data': magic_data}
+PLAYER_TABLES = ('stats', 'max_stats', 'upgrade_cost')
+PLAYER_STATS = ('health', 'energy', 'mana', 'attack', 'magic', 'speed')
+
+# the game of the worker process, kept between its fights
+game = None
+
+
+def start_worker():
+    global game
+    game = HeadlessGame(render=False)
+
+
+class Policy:
+    name = None
+
+    # how far in front of the player the attack reaches
+    def reach(self, player):
+        return TILESIZE // 2
+
+    def attack_key(self, player):
+        return pygame.K_z
+
+    def setup(self, player, weapon):
+        player.weapon_index = list(weapon_data).index(weapon)
+        player.weapon = weapon
+
+    def keys(self, player, monster, path):
+        # far away it walks the way around the obstacles, close by it lines up
+        # with the monster along the longer axis and strikes once in reach.
+        # the last direction pressed is the one faced
+        dx = monster.hitbox.centerx - player.hitbox.centerx
+        dy = monster.hitbox.centery - player.hitbox.centery
+        if abs(dx) >= abs(dy):
+            facing = pygame.K_RIGHT if dx > 0 else pygame.K_LEFT
+            side = (pygame.K_DOWN if dy > 0 else pygame.K_UP) if abs(dy) > monster.hitbox.height // 4 else None
+            gap = abs(dx) - (player.hitbox.width + monster.hitbox.width) // 2
+        else:
+            facing = pygame.K_DOWN if dy > 0 else pygame.K_UP
+            side = (pygame.K_RIGHT if dx > 0 else pygame.K_LEFT) if abs(dx) > monster.hitbox.width // 4 else None
+            gap = abs(dy) - (player.hitbox.height + monster.hitbox.height) // 2
+
+        if gap > self.reach(player) + TILESIZE:
+            path.update(monster)
+            direction = path.direction(pygame.math.Vector2(player.hitbox.center), pygame.math.Vector2(dx, dy).normalize(), player.stats['speed'])
+            keys = []
+            if abs(direction.y) > 0.4:
+                keys.append(pygame.K_DOWN if direction.y > 0 else pygame.K_UP)
+            if abs(direction.x) > 0.4:
+                keys.append(pygame.K_RIGHT if direction.x > 0 else pygame.K_LEFT)
+            return keys
+
+        if side is None and gap <= self.reach(player):
+            return (facing, self.attack_key(player))
+        keys = [side] if side is not None else []
+        if gap > self.reach(player):
+            keys.append(facing)
+        return keys
+
+
+class Melee(Policy):
+    name = 'melee'
+
+
+class Flame(Policy):
+    name = 'flame'
+
+    def reach(self, player):
+        return (int(player.stats['magic']) - 2) * TILESIZE
+
+    def attack_key(self, player):
+        return pygame.K_e
+
+    def setup(self, player, weapon):
+        super().setup(player, weapon)
+        player.magic_index = list(magic_data).index('flame')
+        player.magic = 'flame'
+
+
+POLICIES = {policy.name: policy for policy in (Melee, Flame)}
+
+
+def apply_overrides(overrides, tables):
+    # sets every value and returns the ones it replaced
+    previous = []
+    for path, value in overrides:
+        table, key, *field = path.split('.')
+        entry = tables[table]
+        if field:
+            entry = entry[key]
+            key = field[0]
+        previous.append((entry, key, entry[key]))
+        entry[key] = value
+    return previous
+
+
+def restore(previous):
+    for entry, key, value in reversed(previous):
+        entry[key] = value
+
+
+def spawn_position(level, monster, distance, rng):
+    # an open spot around the player so the monster does not start in an obstacle,
+    # further out when there is none at the distance asked for
+    center = level.player.hitbox.center
+    hitbox = monster.hitbox.copy()
+    for attempt in range(64):
+        angle = rng.random() * 2 * pi
+        reach = distance * (1 + attempt // 16 * 0.5)
+        hitbox.center = (center[0] + cos(angle) * reach, center[1] + sin(angle) * reach)
+        if not any(obstacle.colliderect(hitbox) for obstacle in level.obstacle_sprites.nearby(hitbox)):
+            break
+    return hitbox.center
+
+
+def fight(task):
+    # one monster against a fresh player on a fresh level, until one of them dies
+    setting_overrides = [(path, value) for path, value in task['overrides'] if path.split('.')[0] in SETTING_TABLES]
+    player_overrides = [(path, value) for path, value in task['overrides'] if path.split('.')[0] in PLAYER_TABLES]
+    previous = apply_overrides(setting_overrides, SETTING_TABLES)
+    try:
+        game.reset(task['seed'])
+        level = game.level
+        player = level.player
+
+        # the map monsters and the grass are cleared, grass would catch swings meant for the monster
+        for sprite in list(level.attackable_sprites):
+            sprite.kill()
+
+        apply_overrides(player_overrides, {name: getattr(player, name) for name in PLAYER_TABLES})
+        player.health = player.stats['health']
+        player.energy = player.stats['energy']
+        player.mana = player.stats['mana']
+        policy = POLICIES[task['policy']]()
+        policy.setup(player, task['weapon'])
+        tables = {name: dict(getattr(player, name)) for name in PLAYER_TABLES}
+
+        monster = level.spawn_enemy(task['monster'], (0, 0))
+        hitbox = monster.hitbox
+        hitbox.center = spawn_position(level, monster, task['distance'], random.Random(task['seed']))
+        monster.hitbox = hitbox
+        monster.rect.center = hitbox.center
+        path = FlowField(level.obstacle_sprites)
+
+        keys = controls.ScriptedKeys()
+        controls.use_source(lambda: keys)
+        steps = int(task['max_seconds'] * 1000 / game.clock.step)
+        for _ in range(steps):
+            if not monster.alive() or player.health <= 0:
+                break
+            keys.pressed = set(policy.keys(player, monster, path))
+            game.step()
+        controls.use_source(None)
+
+        won = not monster.alive()
+        return {
+            'index': task['index'],
+            'won': won,
+            'timed_out': monster.alive() and player.health > 0,
+            'ms': game.clock.get_ticks(),
+            'health_lost': player.stats['health'] - max(player.health, 0),
+            'exp': player.exp,
+            'tables': tables}
+    finally:
+        restore(previous)
+
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_options(args=None):
+    parser = argparse.ArgumentParser(description='Runs scripted fights headless on every core and reports how they went as CSV.')
+    parser.add_argument('--monsters', nargs='+', default=list(monster_data), help='monsters to fight, all by default')
+    parser.add_argument('--weapons', nargs='+', default=[list(weapon_data)[0]], help='weapons the player fights with')
+    parser.add_argument('--policies', nargs='+', default=['melee'], help=f'player policies among {", ".join(POLICIES)}')
+    parser.add_argument('--vary', action='append', default=[], metavar='TABLE.KEY[.FIELD]=V1,V2',
+                        help='values to try for one entry, e.g. monster_data.squid.health=80,100 or upgrade_cost.attack=40,50. '
+                             'every combination of the varied entries is run')
+    parser.add_argument('--fights', type=int, default=50, help='fights for every combination')
+    parser.add_argument('--distance', type=int, default=200, help='pixels between the player and the monster at the start')
+    parser.add_argument('--max-seconds', type=float, default=30, help='game seconds before a fight counts as a timeout')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes, every core by default')
+    parser.add_argument('--output', help='file to write the summary to instead of stdout')
+    parser.add_argument('--curve', help='file to write the EXP curve to, the wins needed for every stat upgrade')
+    options = parser.parse_args(args)
+
+    if options.fights < 1:
+        parser.error('--fights has to be at least 1')
+    for name in options.monsters:
+        if name not in monster_data:
+            parser.error(f'unknown monster {name}')
+    for name in options.weapons:
+        if name not in weapon_data:
+            parser.error(f'unknown weapon {name}')
+    for name in options.policies:
+        if name not in POLICIES:
+            parser.error(f'unknown policy {name}')
+
+    options.variations = []
+    for text in options.vary:
+        path, _, values = text.partition('=')
+        table, key, *field = path.split('.')
+        if not values or len(field) > 1:
+            parser.error(f'can not read --vary {text}')
+        if table in SETTING_TABLES:
+            if key not in SETTING_TABLES[table] or len(field) != 1 or field[0] not in SETTING_TABLES[table][key]:
+                parser.error(f'no entry {path} to vary')
+        elif table not in PLAYER_TABLES or key not in PLAYER_STATS or field:
+            parser.error(f'no entry {path} to vary')
+        options.variations.append((path, [parse_value(value) for value in values.split(',')]))
+    return options
+
+
+def make_tasks(options):
+    # the same seeds for every combination, so they differ only in what was varied
+    paths = [path for path, _ in options.variations]
+    combinations = list(product(*[values for _, values in options.variations]))
+    groups = []
+    tasks = []
+    for values, monster, weapon, policy in product(combinations, options.monsters, options.weapons, options.policies):
+        group = (values, monster, weapon, policy)
+        for fight_index in range(options.fights):
+            tasks.append({
+                'index': len(groups),
+                'overrides': list(zip(paths, values)),
+                'monster': monster,
+                'weapon': weapon,
+                'policy': policy,
+                'seed': options.seed + fight_index,
+                'distance': options.distance,
+                'max_seconds': options.max_seconds})
+        groups.append(group)
+    return groups, tasks
+
+
+def run_fights(tasks, workers):
+    if workers <= 1:
+        start_worker()
+        results = [fight(task) for task in tasks]
+        game.close()
+        return results
+    chunk_size = max(len(tasks) // (workers * 4), 1)
+    with ProcessPoolExecutor(workers, initializer=start_worker) as executor:
+        return list(executor.map(fight, tasks, chunksize=chunk_size))
+
+
+def summarize(results):
+    wins = [result for result in results if result['won']]
+    kill_times = [result['ms'] for result in wins]
+    fight_minutes = sum(result['ms'] for result in results) / 60000
+    exp = sum(result['exp'] for result in results)
+    return {
+        'fights': len(results),
+        'wins': len(wins),
+        'timeouts': sum(result['timed_out'] for result in results),
+        'win_rate': round(len(wins) / len(results), 4),
+        'ttk_mean_ms': round(sum(kill_times) / len(kill_times)) if kill_times else '',
+        'ttk_p50_ms': percentile(kill_times, 50) if kill_times else '',
+        'ttk_p95_ms': percentile(kill_times, 95) if kill_times else '',
+        'health_lost_mean': round(sum(result['health_lost'] for result in results) / len(results), 2),
+        'exp_per_fight': round(exp / len(results), 2),
+        'exp_per_minute': round(exp / fight_minutes, 2) if fight_minutes else ''}
+
+
+def exp_curve(tables, exp_per_fight):
+    # what every upgrade of a stat costs as the menu raises it, until the stat is maxed
+    for stat, cost in tables['upgrade_cost'].items():
+        value = tables['stats'][stat]
+        total = 0
+        upgrade = 0
+        while 0 < value < tables['max_stats'][stat]:
+            upgrade += 1
+            total += cost
+            value = min(value * 1.2, tables['max_stats'][stat])
+            yield {
+                'stat': stat,
+                'upgrade': upgrade,
+                'value': round(value, 2),
+                'cost': round(cost, 2),
+                'total_exp': round(total, 2),
+                'fights_needed': ceil(total / exp_per_fight) if exp_per_fight else ''}
+            cost *= 1.4
+
+
+def write_csv(path, rows):
+    output = open(path, 'w', newline='') if path else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames=list(rows[0]) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if path:
+            output.close()
+
+
+def main(args=None):
+    options = parse_options(args)
+    groups, tasks = make_tasks(options)
+
+    start = perf_counter()
+    results = run_fights(tasks, options.workers)
+    elapsed = perf_counter() - start
+
+    by_group = [[] for _ in groups]
+    for result in results:
+        by_group[result['index']].append(result)
+
+    paths = [path for path, _ in options.variations]
+    summary = []
+    curve = []
+    for (values, monster, weapon, policy), group_results in zip(groups, by_group):
+        row = dict(zip(paths, values))
+        row.update(monster=monster, weapon=weapon, policy=policy)
+        stats = summarize(group_results)
+        summary.append({**row, **stats})
+        for point in exp_curve(group_results[0]['tables'], stats['exp_per_fight']):
+            curve.append({**row, **point})
+
+    write_csv(options.output, summary)
+    if options.curve:
+        write_csv(options.curve, curve)
+    print(f'{len(tasks)} fights in {elapsed:.1f}s ({len(tasks) / elapsed * 60:.0f} per minute) on {options.workers} workers', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+import sys
+import json
+import platform
+import argparse
+import tracemalloc
+from math import cos, sin, pi, ceil
+from time import perf_counter
+
+from headless import HeadlessGame
+import pygame
+from settings import *
+import controls
+from pathfinding import FlowField
+
+
+class Scenario:
+    name = None
+
+    def __init__(self, options):
+        self.options = options
+
+    def setup(self, level):
+        pass
+
+    def keys(self, level, frame):
+        return ()
+
+    def refill(self, player):
+        player.health = player.stats['health']
+        player.energy = player.stats['energy']
+        player.mana = player.stats['mana']
+
+
+class Idle(Scenario):
+    name = 'idle'
+
+
+class Sprint(Scenario):
+    name = 'sprint'
+
+    # tiles on the open ground west, north and south east of the spawn,
+    # so the camera crosses the map and the chunks around it change
+    waypoints = ((6, 24), (24, 7), (33, 21), (45, 43), (33, 21))
+
+    def setup(self, level):
+        # one field for every waypoint, they reach across the whole map
+        self.field = FlowField(level.obstacle_sprites, reach=200)
+        self.waypoint = 0
+
+    def keys(self, level, frame):
+        player = level.player
+        self.refill(player)
+
+        # a waypoint counts once the hitbox is within a tile of its middle,
+        # the hitbox can not always fit on the tile itself
+        position = pygame.math.Vector2(player.hitbox.center)
+        goal = self.waypoints[self.waypoint]
+        target = pygame.math.Vector2((goal[0] + 0.5) * TILESIZE, (goal[1] + 0.5) * TILESIZE)
+        if position.distance_to(target) < TILESIZE:
+            self.waypoint = (self.waypoint + 1) % len(self.waypoints)
+            goal = self.waypoints[self.waypoint]
+            target = pygame.math.Vector2((goal[0] + 0.5) * TILESIZE, (goal[1] + 0.5) * TILESIZE)
+        if self.field.goal != goal:
+            self.field.goal = goal
+            self.field.build(goal)
+
+        # the way along the field in the eight directions the keys can give
+        straight = (target - position).normalize() if target != position else pygame.math.Vector2()
+        direction = self.field.direction(position, straight, player.stats['speed'])
+        keys = [pygame.K_LSHIFT]
+        if abs(direction.x) > 0.2:
+            keys.append(pygame.K_RIGHT if direction.x > 0 else pygame.K_LEFT)
+        if abs(direction.y) > 0.2:
+            keys.append(pygame.K_DOWN if direction.y > 0 else pygame.K_UP)
+        return keys
+
+
+class Chase(Scenario):
+    name = 'chase'
+
+    def setup(self, level):
+        # a ring of monsters inside their notice radius
+        names = list(monster_data.keys())
+        center = level.player.rect.center
+        count = self.options.enemies
+        for index in range(count):
+            angle = 2 * pi * index / count
+            pos = (center[0] + cos(angle) * 280, center[1] + sin(angle) * 280)
+            level.spawn_enemy(names[index % len(names)], pos)
+
+    def keys(self, level, frame):
+        self.refill(level.player)
+        return ()
+
+
+class GrassCutting(Scenario):
+    name = 'grass'
+
+    def keys(self, level, frame):
+        player = level.player
+        self.refill(player)
+
+        # stand above the closest grass tile and keep swinging down
+        if frame % 20 == 0:
+            grass = [sprite for sprite in level.attackable_sprites if sprite.sprite_type == 'grass']
+            if grass:
+                x, y = player.hitbox.center
+                target = min(grass, key=lambda sprite: (sprite.rect.centerx - x) ** 2 + (sprite.rect.centery - y) ** 2)
+                player.hitbox.midbottom = target.rect.midtop
+                player.rect.center = player.hitbox.center
+            return (pygame.K_DOWN,)
+        return (pygame.K_z,)
+
+
+class FlameCasting(Scenario):
+    name = 'flame'
+
+    def setup(self, level):
+        level.player.stats['magic'] = level.player.max_stats['magic']
+
+    def keys(self, level, frame):
+        self.refill(level.player)
+        return (pygame.K_e,)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (Idle, Sprint, Chase, GrassCutting, FlameCasting)}
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def run_scenario(scenario_class, options):
+    game = HeadlessGame(seed=options.seed)
+    level = game.level
+    scenario = scenario_class(options)
+    scenario.setup(level)
+
+    keys = controls.ScriptedKeys()
+    controls.use_source(lambda: keys)
+
+    frame_times = []
+    drawn = []
+    blocks = []
+    peaks = []
+    for frame in range(options.warmup + options.frames):
+        keys.pressed = set(scenario.keys(level, frame))
+        if options.trace_allocations:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        blocks_before = sys.getallocatedblocks()
+
+        start = perf_counter()
+        game.step()
+        elapsed = perf_counter() - start
+
+        if frame < options.warmup:
+            continue
+        frame_times.append(elapsed * 1000)
+        drawn.append(level.visible_sprites.drawn_sprites)
+        blocks.append(sys.getallocatedblocks() - blocks_before)
+        if options.trace_allocations:
+            peaks.append(tracemalloc.get_traced_memory()[1] - traced_before)
+
+    controls.use_source(None)
+    game.close()
+    result = {
+        'scenario': scenario.name,
+        'frames': len(frame_times),
+        'frame_ms': {
+            'mean': sum(frame_times) / len(frame_times),
+            'p95': percentile(frame_times, 95),
+            'p99': percentile(frame_times, 99),
+            'max': max(frame_times)},
+        'sprites': len(level.visible_sprites),
+        'sprites_drawn': sum(drawn) / len(drawn),
+        'allocated_blocks_per_frame': sum(blocks) / len(blocks)}
+    if peaks:
+        result['peak_allocation_bytes'] = {'mean': sum(peaks) / len(peaks), 'max': max(peaks)}
+    return result
+
+
+def parse_options(args=None):
+    parser = argparse.ArgumentParser(description='Runs scripted scenarios headless and reports frame times as JSON.')
+    parser.add_argument('scenarios', nargs='*', help=f'scenarios to run among {", ".join(SCENARIOS)}, all by default')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--enemies', type=int, default=50, help='monsters spawned by the chase scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-allocations', action='store_true', help='also trace allocated bytes, which slows the frames down')
+    parser.add_argument('--output', help='file to write the results to instead of stdout')
+    options = parser.parse_args(args)
+    for name in options.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name}')
+    return options
+
+
+def main(args=None):
+    options = parse_options(args)
+    if options.trace_allocations:
+        tracemalloc.start()
+
+    report = {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'options': {key: value for key, value in vars(options).items() if key not in ('scenarios', 'output')},
+        'results': [run_scenario(SCENARIOS[name], options) for name in (options.scenarios or SCENARIOS)]}
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
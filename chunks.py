@@ -0,0 +1,119 @@
+import pygame
+from bisect import insort
+from settings import *
+
+
+class StaticChunks:
+    def __init__(self, floor_surface, chunk_size=STATIC_CHUNK_SIZE):
+
+        # chunk setup
+        self.floor_surface = floor_surface
+        self.floor_chunks = {}
+        self.chunk_pixels = chunk_size * TILESIZE
+        self.members = {}
+        self.homes = {}
+        self.surfaces = {}
+        self.baked_chunks = 0
+
+        # every tile cell a static rect covers, to find what stands in front
+        self.cover = {}
+        self.version = 0
+
+    def chunk_range(self, rect):
+        size = self.chunk_pixels
+        left = rect.left // size
+        top = rect.top // size
+        right = max(rect.right - 1, rect.left) // size
+        bottom = max(rect.bottom - 1, rect.top) // size
+        return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+    def cell_range(self, rect):
+        left = rect.left // TILESIZE
+        top = rect.top // TILESIZE
+        right = max(rect.right - 1, rect.left) // TILESIZE
+        bottom = max(rect.bottom - 1, rect.top) // TILESIZE
+        return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+    def home(self, sprite):
+        return (sprite.rect.centerx // self.chunk_pixels, sprite.rect.centery // self.chunk_pixels)
+
+    def add(self, key):
+        # a sprite is baked into every chunk its rect overlaps
+        sprite = key[2]
+        for chunk in self.chunk_range(sprite.rect):
+            insort(self.members.setdefault(chunk, []), key)
+            self.surfaces.pop(chunk, None)
+        for cell in self.cell_range(sprite.rect):
+            self.cover.setdefault(cell, []).append(key)
+        self.version += 1
+        home = self.home(sprite)
+        self.homes[home] = self.homes.get(home, 0) + 1
+
+    def remove(self, key):
+        sprite = key[2]
+        for chunk in self.chunk_range(sprite.rect):
+            self.members[chunk].remove(key)
+            if not self.members[chunk]:
+                del self.members[chunk]
+            self.surfaces.pop(chunk, None)
+        for cell in self.cell_range(sprite.rect):
+            self.cover[cell].remove(key)
+            if not self.cover[cell]:
+                del self.cover[cell]
+        self.version += 1
+        home = self.home(sprite)
+        self.homes[home] -= 1
+        if not self.homes[home]:
+            del self.homes[home]
+
+    def in_front(self, key, rect):
+        # baked statics overlapping the rect that sort after the key
+        depth = key[:2]
+        seen = set()
+        cover = self.cover
+        for cell in self.cell_range(rect):
+            for static_key in cover.get(cell, ()):
+                if static_key[:2] > depth and static_key[1] not in seen and static_key[2].rect.colliderect(rect):
+                    seen.add(static_key[1])
+                    yield static_key
+
+    def set_floor(self, chunk, surface):
+        # pieces of a streamed floor, one per chunk
+        if surface is None:
+            self.floor_chunks.pop(chunk, None)
+        else:
+            self.floor_chunks[chunk] = surface
+        self.surfaces.pop(chunk, None)
+
+    def bake(self, chunk):
+        origin_x = chunk[0] * self.chunk_pixels
+        origin_y = chunk[1] * self.chunk_pixels
+
+        # the floor is baked in too so the chunk can be blitted without blending
+        surface = pygame.Surface((self.chunk_pixels, self.chunk_pixels)).convert()
+        surface.fill(WATER_COLOR)
+        if self.floor_surface:
+            surface.blit(self.floor_surface, (-origin_x, -origin_y))
+        elif chunk in self.floor_chunks:
+            surface.blit(self.floor_chunks[chunk], (0, 0))
+        surface.blits([(sprite.image, (sprite.rect.x - origin_x, sprite.rect.y - origin_y)) for _, __, sprite in self.members.get(chunk, ())], False)
+        self.surfaces[chunk] = surface
+        self.baked_chunks += 1
+        return surface
+
+    def blits(self, offset, view_rect):
+        # chunks near the camera keep their surface, the others are dropped
+        size = self.chunk_pixels
+        keep_rect = view_rect.inflate(size, size)
+        for chunk in [chunk for chunk in self.surfaces if not keep_rect.colliderect((chunk[0] * size, chunk[1] * size, size, size))]:
+            del self.surfaces[chunk]
+
+        blit_list = []
+        drawn = 0
+        for chunk in self.chunk_range(view_rect):
+            surface = self.surfaces.get(chunk)
+            if surface is None:
+                surface = self.bake(chunk)
+            blit_list.append((surface, (chunk[0] * size - offset.x, chunk[1] * size - offset.y)))
+            drawn += self.homes.get(chunk, 0)
+        return blit_list, drawn
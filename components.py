@@ -0,0 +1,121 @@
+from array import array
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ComponentStore:
+    def __init__(self, columns):
+
+        # one typed array per component, an entity is a slot in all of them
+        self.columns = columns
+        for name, typecode in columns.items():
+            setattr(self, name, array(typecode))
+        self.alive = bytearray()
+        self.free = []
+        self.size = 0
+
+    def allocate(self):
+        # slots of released entities are handed out again
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = self.size
+            self.size += 1
+            for name in self.columns:
+                getattr(self, name).append(0)
+            self.alive.append(0)
+        self.alive[slot] = 1
+        return slot
+
+    def release(self, slot):
+        if self.alive[slot]:
+            self.alive[slot] = 0
+            self.free.append(slot)
+
+    def view(self, name):
+        # the array can not grow while a view of it is kept
+        column = getattr(self, name)
+        return np.frombuffer(column, column.typecode)
+
+
+class Column:
+    # an attribute of a handle that lives in the store of the handle
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, handle, owner=None):
+        if handle is None:
+            return self
+        return getattr(handle.store, self.name)[handle.slot]
+
+    def __set__(self, handle, value):
+        getattr(handle.store, self.name)[handle.slot] = value
+
+
+class FlagColumn(Column):
+    def __get__(self, handle, owner=None):
+        if handle is None:
+            return self
+        return getattr(handle.store, self.name)[handle.slot] != 0
+
+
+class TimeColumn(Column):
+    # timestamps that are None until something happens are stored as nan
+    def __get__(self, handle, owner=None):
+        if handle is None:
+            return self
+        value = getattr(handle.store, self.name)[handle.slot]
+        return None if value != value else value
+
+    def __set__(self, handle, value):
+        getattr(handle.store, self.name)[handle.slot] = float('nan') if value is None else value
+
+
+class CodeColumn(Column):
+    # strings out of a fixed set, stored as their index
+    def __init__(self, values):
+        self.values = values
+        self.codes = {value: code for code, value in enumerate(values)}
+
+    def __get__(self, handle, owner=None):
+        if handle is None:
+            return self
+        return self.values[getattr(handle.store, self.name)[handle.slot]]
+
+    def __set__(self, handle, value):
+        getattr(handle.store, self.name)[handle.slot] = self.codes[value]
+
+
+class RectColumn:
+    # a rect kept as four int columns. reading it gives a new rect,
+    # so a changed rect has to be set back
+    def __set_name__(self, owner, name):
+        self.names = (f'{name}_x', f'{name}_y', f'{name}_width', f'{name}_height')
+
+    def __get__(self, handle, owner=None):
+        if handle is None:
+            return self
+        return pygame.Rect([getattr(handle.store, name)[handle.slot] for name in self.names])
+
+    def __set__(self, handle, rect):
+        for name, value in zip(self.names, rect):
+            getattr(handle.store, name)[handle.slot] = value
+
+
+class VectorColumn:
+    # a vector kept as two float columns, set back like a rect
+    def __set_name__(self, owner, name):
+        self.names = (f'{name}_x', f'{name}_y')
+
+    def __get__(self, handle, owner=None):
+        if handle is None:
+            return self
+        return pygame.math.Vector2([getattr(handle.store, name)[handle.slot] for name in self.names])
+
+    def __set__(self, handle, vector):
+        for name, value in zip(self.names, vector):
+            getattr(handle.store, name)[handle.slot] = value
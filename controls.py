@@ -0,0 +1,24 @@
+import pygame
+
+
+class ScriptedKeys:
+    def __init__(self, pressed=()):
+        self.pressed = set(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+# the real keyboard unless a source is installed
+source = None
+
+
+def use_source(new_source):
+    global source
+    source = new_source
+
+
+def get_pressed():
+    if source is None:
+        return pygame.key.get_pressed()
+    return source()
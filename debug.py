@@ -1,4 +1,6 @@
 import pygame
+from collections import deque
+from time import perf_counter
 pygame.init()
 font = pygame.font.Font(None,30)
 
@@ -8,3 +10,60 @@ def debug(info,y = 10, x = 10):
 	debug_rect = debug_surf.get_rect(topleft = (x,y))
 	pygame.draw.rect(display_surface,'Black',debug_rect)
 	display_surface.blit(debug_surf,debug_rect)
+
+
+class FrameProfiler:
+	def __init__(self, buckets, window = 120, refresh = 15):
+		self.enabled = False
+		self.buckets = buckets
+		self.samples = {bucket: deque(maxlen = window) for bucket in buckets}
+		self.starts = {}
+
+		# the text is only rendered again when a value shown changes
+		self.refresh = refresh
+		self.frame = 0
+		self.lines = []
+		self.surfaces = {}
+
+	def toggle(self):
+		self.enabled = not self.enabled
+		for samples in self.samples.values():
+			samples.clear()
+
+	def start(self, bucket):
+		if self.enabled:
+			self.starts[bucket] = perf_counter()
+
+	def stop(self, bucket):
+		if self.enabled:
+			self.samples[bucket].append((perf_counter() - self.starts[bucket]) * 1000)
+
+	def averages(self):
+		return {bucket: sum(samples) / len(samples) if samples else 0 for bucket, samples in self.samples.items()}
+
+	def render_line(self, text):
+		if text not in self.surfaces:
+			if len(self.surfaces) > 256:
+				self.surfaces.clear()
+			self.surfaces[text] = font.render(text, True, 'White')
+		return self.surfaces[text]
+
+	def display(self, x = 10, y = 100):
+		if not self.enabled:
+			return
+
+		if self.frame % self.refresh == 0:
+			averages = self.averages()
+			lines = [f'{bucket}: {averages[bucket]:.2f} ms' for bucket in self.buckets]
+			lines.append(f'total: {sum(averages.values()):.2f} ms')
+			self.lines = [self.render_line(line) for line in lines]
+		self.frame += 1
+
+		display_surface = pygame.display.get_surface()
+		for index, line_surf in enumerate(self.lines):
+			line_rect = line_surf.get_rect(topleft = (x, y + index * line_surf.get_height()))
+			pygame.draw.rect(display_surface, 'Black', line_rect)
+			display_surface.blit(line_surf, line_rect)
+
+
+profiler = FrameProfiler(('floor blit', 'sprite sort', 'sprite blit', 'update', 'enemy update', 'attack logic', 'ui'))
@@ -0,0 +1,91 @@
+import pygame
+from collections import Counter
+from settings import *
+
+
+class DirtyTracker:
+    def __init__(self, screen_rect, max_rects=DIRTY_RECT_LIMIT):
+        self.screen_rect = screen_rect
+        self.max_rects = max_rects
+
+        # what was blitted last frame and from where
+        self.keys = None
+        self.offset = None
+        self.full = True
+
+    def invalidate(self):
+        self.full = True
+
+    def blit_key(self, entry):
+        area = tuple(entry[2]) if len(entry) > 2 else None
+        return (entry[0], entry[1][0], entry[1][1], area)
+
+    def key_rect(self, key):
+        # a pixel of slack covers the rounding of float positions
+        surface, x, y, area = key
+        width, height = area[2:] if area else surface.get_size()
+        return pygame.Rect(int(x) - 1, int(y) - 1, width + 2, height + 2)
+
+    def changed_keys(self, previous, keys):
+        # sets are enough while no blit is repeated, a repeat needs the counts
+        old = set(previous)
+        new = set(keys)
+        if len(old) == len(previous) and len(new) == len(keys):
+            changed = [key for key in previous if key not in new] + [key for key in keys if key not in old]
+        else:
+            old = Counter(previous)
+            new = Counter(keys)
+            changed = list((old - new).elements()) + list((new - old).elements())
+        if changed:
+            return changed
+
+        # the same blits in another order, everything between the first
+        # and the last difference is redrawn
+        start = next(index for index, pair in enumerate(zip(previous, keys)) if pair[0] != pair[1])
+        end = len(keys) - next(index for index, pair in enumerate(zip(reversed(previous), reversed(keys))) if pair[0] != pair[1])
+        return previous[start:end] + keys[start:end]
+
+    def merge(self, rects, elements=()):
+        elements = [element.clip(self.screen_rect) for element in elements]
+        merged = []
+        pending = list(rects)
+        while pending:
+            rect = pending.pop().clip(self.screen_rect)
+            if not rect.width or not rect.height:
+                continue
+
+            # overlapping rects are joined until none overlap
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+
+            # outlines are not drawn the same when clipped, so an element
+            # cut by a rect is redrawn whole
+            if not pending:
+                pending = [element for element in elements if element.collidelist(merged) != -1 and not any(rect.contains(element) for rect in merged)]
+        return merged
+
+    def update(self, offset, blit_list, rects=(), elements=()):
+        # the rects to redraw this frame, or None when it all has to be
+        keys = [self.blit_key(entry) for entry in blit_list]
+        offset = (offset[0], offset[1])
+        previous = self.keys
+        full = self.full or offset != self.offset
+        self.keys = keys
+        self.offset = offset
+        self.full = False
+        if full:
+            return None
+
+        rects = list(rects)
+        if keys != previous:
+            rects.extend(self.key_rect(key) for key in self.changed_keys(previous, keys))
+        rects = self.merge(rects, elements)
+
+        # many or large regions are cheaper to redraw in one go
+        area = sum(rect.width * rect.height for rect in rects)
+        if len(rects) > self.max_rects or area * 2 > self.screen_rect.width * self.screen_rect.height:
+            return None
+        return rects
@@ -2,9 +2,16 @@ import pygame
 from settings import *
 from entity import Entity
 from support import *
+from assets import assets
+from components import ComponentStore, Column, FlagColumn, TimeColumn, CodeColumn, RectColumn, VectorColumn, np
+from enemy_ai import STATUSES
+import timing
 
 class Enemy(Entity):
-    def __init__(self, monster_name, pos, groups, obstacle_sprites, damage_player, trigger_death_particles, add_exp):
+    # set by the attackable group, which is told whenever the rect changes
+    attackable_grid = None
+
+    def __init__(self, monster_name, pos, groups, obstacle_sprites, damage_player, trigger_death_particles, add_exp, flow_field=None):
 
         # general setup
         super().__init__(groups)
@@ -20,6 +27,9 @@ class Enemy(Entity):
         self.hitbox = self.rect.inflate(0,-10)
         self.obstacle_sprites = obstacle_sprites
 
+        # monsters wider than a tile do not fit the paths of the flow field
+        self.flow_field = flow_field if self.hitbox.width <= TILESIZE else None
+
         #stats
         self.monster_name = monster_name
         monster_info = monster_data[self.monster_name]
@@ -46,19 +56,16 @@ class Enemy(Entity):
         self.invincibility_duration = 300
 
         # sounds
-        self.death_sound = pygame.mixer.Sound('./audio/death.wav')
-        self.hit_sound = pygame.mixer.Sound('./audio/hit.wav')
-        self.attack_sound = pygame.mixer.Sound(monster_info['attack_sound'])
-        self.death_sound.set_volume(0.05)
-        self.hit_sound.set_volume(0.05)
-        self.attack_sound.set_volume(0.05)
+        self.death_sound = assets.sound('./audio/death.wav', 0.05)
+        self.hit_sound = assets.sound('./audio/hit.wav', 0.05)
+        self.attack_sound = assets.sound(monster_info['attack_sound'], 0.05)
 
 
     def import_graphics(self, name):
         self.animations = {'idle': [], 'move': [], 'attack': []}
         main_path = f'./graphics/monsters/{name}/'
         for animation in self.animations.keys():
-            self.animations[animation] = import_folder(main_path + animation)
+            self.animations[animation] = assets.folder(main_path + animation)
 
     def get_player_distance_direction(self, player):
         enemy_vec = pygame.math.Vector2(self.rect.center)
@@ -75,21 +82,28 @@ class Enemy(Entity):
         distance = self.get_player_distance_direction(player)[0]
 
         if distance <= self.attack_radius and self.can_attack:
-            if self.status != 'attack':
-                self.frame_index = 0
-            self.status = 'attack'
+            self.set_status('attack')
         elif distance <= self.notice_radius:
-            self.status = 'move'
+            self.set_status('move')
         else:
-            self.status = 'idle'
+            self.set_status('idle')
 
-    def actions(self, player):
+    def set_status(self, status):
+        if status == 'attack' and self.status != 'attack':
+            self.frame_index = 0
+        self.status = status
+
+    def actions(self, player, direction=None, steered=False):
         if self.status == 'attack':
-            self.attack_time = pygame.time.get_ticks()
+            self.attack_time = timing.get_ticks()
             self.damage_player(self.attack_damage, self.attack_type)
             self.attack_sound.play()
         elif self.status == 'move':
-            self.direction = self.get_player_distance_direction(player)[1]
+            if direction is None:
+                direction = self.get_player_distance_direction(player)[1]
+            if self.flow_field and not steered:
+                direction = self.flow_field.direction(pygame.math.Vector2(self.hitbox.center), direction, self.speed)
+            self.direction = direction
         else:
             self.direction = pygame.math.Vector2()
 
@@ -106,16 +120,31 @@ class Enemy(Entity):
         # set the image
         self.image = animation[int(self.frame_index)]
         self.rect = self.image.get_rect(center=self.hitbox.center)
+        self.placed()
 
-        # flicker
+        # flicker on a copy since the frames are shared
         if not self.vulnerable:
             alpha = self.wave_value()
+            self.image = self.image.copy()
             self.image.set_alpha(alpha)
-        else:
-            self.image.set_alpha(255)
+
+    def skip_frames(self, count):
+        # what update does to an idle enemy standing still, without the drawing
+        animation = self.animations[self.status]
+        for _ in range(count):
+            self.frame_index += self.animation_speed
+            if self.frame_index >= len(animation):
+                self.frame_index = 0
+        self.image = animation[int(self.frame_index)]
+        self.rect = self.image.get_rect(center=self.hitbox.center)
+        self.placed()
+
+    def placed(self):
+        if self.attackable_grid is not None:
+            self.attackable_grid.moved(self)
 
     def cooldown(self):
-        current_time = pygame.time.get_ticks()
+        current_time = timing.get_ticks()
         if not self.can_attack:
             if current_time - self.attack_time >= self.attack_cooldown:
                 self.can_attack = True
@@ -130,9 +159,13 @@ class Enemy(Entity):
             if attack_type == 'weapon':
                 self.health -= player.get_full_weapon_damage()
                 self.check_death()
+
+                # a dead enemy may have handed its slot in the store to someone else
+                if not self.alive():
+                    return
             else:
                 self.health -= player.get_full_magic_damage()
-            self.hit_time = pygame.time.get_ticks()
+            self.hit_time = timing.get_ticks()
             self.vulnerable = False
 
     def check_death(self):
@@ -156,3 +189,86 @@ class Enemy(Entity):
     def enemy_update(self, player):
         self.get_status(player)
         self.actions(player)
+
+
+class EnemyStore(ComponentStore):
+    def __init__(self):
+        super().__init__({
+            'health': 'd',
+            'speed': 'i',
+            'attack_damage': 'i',
+            'resistance': 'i',
+            'attack_radius': 'i',
+            'notice_radius': 'i',
+            'status': 'b',
+            'can_attack': 'b',
+            'attack_time': 'd',
+            'attack_cooldown': 'i',
+            'vulnerable': 'b',
+            'hit_time': 'd',
+            'invincibility_duration': 'i',
+            'hitbox_x': 'i',
+            'hitbox_y': 'i',
+            'hitbox_width': 'i',
+            'hitbox_height': 'i',
+            'direction_x': 'd',
+            'direction_y': 'd'})
+
+    def centers(self, slots):
+        # the centers of the hitboxes, which the rects are kept centered on
+        return np.stack((
+            self.view('hitbox_x')[slots] + self.view('hitbox_width')[slots] // 2,
+            self.view('hitbox_y')[slots] + self.view('hitbox_height')[slots] // 2), axis=1).astype(float)
+
+    def cooldowns(self, current_time):
+        # the cooldowns of every enemy at once, in place of Enemy.cooldown
+        if np is not None:
+            alive = np.frombuffer(self.alive, np.int8) != 0
+            for flag, time, duration in (('can_attack', 'attack_time', 'attack_cooldown'), ('vulnerable', 'hit_time', 'invincibility_duration')):
+                flags = self.view(flag)
+                flags[alive & (flags == 0) & (current_time - self.view(time) >= self.view(duration))] = 1
+            return
+
+        for slot in range(self.size):
+            if self.alive[slot]:
+                if not self.can_attack[slot] and current_time - self.attack_time[slot] >= self.attack_cooldown[slot]:
+                    self.can_attack[slot] = 1
+                if not self.vulnerable[slot] and current_time - self.hit_time[slot] >= self.invincibility_duration[slot]:
+                    self.vulnerable[slot] = 1
+
+
+class StoredEnemy(Enemy):
+    # an enemy whose position, movement and combat state live in the typed
+    # arrays of an EnemyStore. the sprite keeps what pygame and the drawing
+    # read, the rect, the image and its animations
+
+    health = Column()
+    speed = Column()
+    attack_damage = Column()
+    resistance = Column()
+    attack_radius = Column()
+    notice_radius = Column()
+    status = CodeColumn(STATUSES)
+    can_attack = FlagColumn()
+    attack_time = TimeColumn()
+    attack_cooldown = Column()
+    vulnerable = FlagColumn()
+    hit_time = TimeColumn()
+    invincibility_duration = Column()
+    hitbox = RectColumn()
+    direction = VectorColumn()
+
+    def __init__(self, store, *args):
+        self.store = store
+        self.slot = store.allocate()
+        super().__init__(*args)
+
+    def cooldown(self):
+        # the store runs the cooldowns of every enemy after the update
+        pass
+
+    def kill(self):
+        alive = self.alive()
+        super().kill()
+        if alive:
+            self.store.release(self.slot)
@@ -0,0 +1,140 @@
+import pygame
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from settings import *
+from pathfinding import steer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STATUSES = ('idle', 'move', 'attack')
+
+
+class EnemyBatch:
+    def __init__(self):
+        self.enemies = []
+        self.dirty = True
+
+    def rebuild(self, enemies):
+        # the radii only change when an enemy comes or goes
+        self.enemies = list(enemies)
+        count = len(self.enemies)
+        self.dirty = False
+
+        # enemies kept in a component store are read straight from its arrays
+        self.store = getattr(self.enemies[0], 'store', None) if self.enemies else None
+        if self.store and all(getattr(enemy, 'store', None) is self.store for enemy in self.enemies):
+            self.slots = np.fromiter((enemy.slot for enemy in self.enemies), int, count)
+            self.attack_radius = self.store.view('attack_radius')[self.slots].astype(float)
+            self.notice_radius = self.store.view('notice_radius')[self.slots].astype(float)
+            return
+        self.store = None
+        self.attack_radius = np.fromiter((enemy.attack_radius for enemy in self.enemies), float, count)
+        self.notice_radius = np.fromiter((enemy.notice_radius for enemy in self.enemies), float, count)
+
+    def decide(self, player):
+        count = len(self.enemies)
+        if self.store:
+            positions = self.store.centers(self.slots)
+            can_attack = self.store.view('can_attack')[self.slots] != 0
+        else:
+            positions = np.array([enemy.rect.center for enemy in self.enemies], float).reshape(count, 2)
+            can_attack = np.fromiter((enemy.can_attack for enemy in self.enemies), bool, count)
+
+        # same operations as Vector2.magnitude and normalize
+        delta = np.array(player.rect.center, float) - positions
+        distance = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+        direction = np.zeros_like(delta)
+        moving = distance > 0
+        direction[moving] = delta[moving] / distance[moving, None]
+
+        status = np.where(distance <= self.notice_radius, 1, 0)
+        status[(distance <= self.attack_radius) & can_attack] = 2
+        return status, direction
+
+    def update(self, enemies, player):
+        if self.dirty:
+            self.rebuild(enemies)
+        if not self.enemies:
+            return
+
+        # statuses only depend on the player position, so they can all be
+        # decided before the first attack lands
+        status, direction = self.decide(player)
+        for enemy, code, (x, y) in zip(self.enemies, status.tolist(), direction.tolist()):
+            enemy.set_status(STATUSES[code])
+            enemy.actions(player, pygame.math.Vector2(x, y))
+
+
+def decide_rows(rows, start, end, player_center, goal, next_cells):
+    # the decisions of a slice of a snapshot, without touching any sprite.
+    # the same operations as get_status and actions, so any worker gets the same result
+    player_vec = pygame.math.Vector2(player_center)
+    decisions = []
+    for index in range(start, end):
+        center, hitbox_center, attack_radius, notice_radius, can_attack, speed, steered = rows[index]
+        delta = player_vec - pygame.math.Vector2(center)
+        distance = delta.magnitude()
+        direction = delta.normalize() if distance > 0 else pygame.math.Vector2()
+        if distance > notice_radius:
+            decisions.append((0, (0.0, 0.0)))
+            continue
+
+        # attackers get a direction too, for when their attack is over by the sync point
+        if steered:
+            direction = steer(next_cells, goal, pygame.math.Vector2(hitbox_center), direction, speed)
+        decisions.append((2 if distance <= attack_radius and can_attack else 1, (direction.x, direction.y)))
+    return decisions
+
+
+class EnemyPipeline:
+    def __init__(self, workers=ENEMY_AI_WORKERS, processes=ENEMY_AI_PROCESSES, chunk_size=ENEMY_AI_CHUNK):
+        self.executor = ProcessPoolExecutor(workers) if processes else ThreadPoolExecutor(workers)
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.pending = None
+
+    def submit(self, enemies, player, flow_field):
+        # the workers read a copy of the state while the main thread keeps
+        # moving the sprites, which are only ever read here
+        rows = [(
+            enemy.rect.center,
+            enemy.hitbox.center,
+            enemy.attack_radius,
+            enemy.notice_radius,
+            enemy.can_attack,
+            enemy.speed,
+            enemy.flow_field is not None) for enemy in enemies]
+
+        # the slices only depend on the chunk size, never on the worker count
+        goal = flow_field.goal if flow_field else None
+        next_cells = flow_field.next_cell if flow_field else {}
+        futures = []
+        for start in range(0, len(rows), self.chunk_size):
+            end = min(start + self.chunk_size, len(rows))
+            if self.processes:
+                # a process is only sent the cells its enemies stand in, not the whole field
+                chunk = rows[start:end]
+                cells = {(int(x) // TILESIZE, int(y) // TILESIZE) for _, (x, y), *_ in chunk}
+                chunk_cells = {cell: next_cells[cell] for cell in cells if cell in next_cells}
+                futures.append(self.executor.submit(decide_rows, chunk, 0, end - start, player.rect.center, goal, chunk_cells))
+            else:
+                futures.append(self.executor.submit(decide_rows, rows, start, end, player.rect.center, goal, next_cells))
+        self.pending = (list(enemies), futures)
+
+    def collect(self):
+        # the sync point, results come back in the order of the snapshot
+        if self.pending is None:
+            return [], []
+        enemies, futures = self.pending
+        self.pending = None
+        decisions = []
+        for future in futures:
+            decisions.extend(future.result())
+        return enemies, decisions
+
+    def close(self):
+        # the workers outlive the level unless they are shut down
+        self.pending = None
+        self.executor.shutdown(cancel_futures=True)
@@ -1,5 +1,6 @@
 import pygame
 from math import sin
+import timing
 
 class Entity(pygame.sprite.Sprite):
     def __init__(self, groups):
@@ -13,30 +14,33 @@ class Entity(pygame.sprite.Sprite):
         if self.direction.magnitude() != 0:
             self.direction = self.direction.normalize()
 
-        self.hitbox.x += self.direction.x * speed
-        self.collision('horizontal')
-        self.hitbox.y += self.direction.y * speed
-        self.collision('vertical')
-        self.rect.center = self.hitbox.center
+        # the hitbox is moved as one rect and set back, it may live in a component store
+        hitbox = self.hitbox
+        hitbox.x += self.direction.x * speed
+        self.collision('horizontal', hitbox)
+        hitbox.y += self.direction.y * speed
+        self.collision('vertical', hitbox)
+        self.hitbox = hitbox
+        self.rect.center = hitbox.center
 
-    def collision(self, direction):
+    def collision(self, direction, hitbox):
         if direction == 'horizontal':
-            for sprite in self.obstacle_sprites:
-                if sprite.hitbox.colliderect(self.hitbox):
+            for obstacle in self.obstacle_sprites.nearby(hitbox):
+                if obstacle.colliderect(hitbox):
                     if self.direction.x > 0:  # moving right
-                        self.hitbox.right = sprite.hitbox.left
+                        hitbox.right = obstacle.left
                     if self.direction.x < 0:  # moving left
-                        self.hitbox.left = sprite.hitbox.right
+                        hitbox.left = obstacle.right
         if direction == 'vertical':
-            for sprite in self.obstacle_sprites:
-                if sprite.hitbox.colliderect(self.hitbox):
+            for obstacle in self.obstacle_sprites.nearby(hitbox):
+                if obstacle.colliderect(hitbox):
                     if self.direction.y > 0:  # moving down
-                        self.hitbox.bottom = sprite.hitbox.top
+                        hitbox.bottom = obstacle.top
                     if self.direction.y < 0:  # moving up
-                        self.hitbox.top = sprite.hitbox.bottom
+                        hitbox.top = obstacle.bottom
 
     def wave_value(self):
-        value = sin(pygame.time.get_ticks())
+        value = sin(timing.get_ticks())
         if value >= 0:
             return 255
         else:
@@ -0,0 +1,76 @@
+import os
+import random
+
+# the dummy drivers have to be picked before pygame opens the display
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+from settings import *
+import timing
+
+
+class HeadlessGame:
+    def __init__(self, seed=0, step=1000 / FPS, render=True):
+
+        # general setup
+        pygame.init()
+        self.screen = pygame.display.set_mode((WIDTH, HEIGTH))
+        self.render = render
+        self.step_ms = step
+        self.level = None
+        self.reset(seed)
+
+    def reset(self, seed=0):
+        # a new level from the start of time, the loaded assets are kept
+        if self.level:
+            self.level.close()
+        self.frame = 0
+        self.finished = False
+        pygame.event.clear()
+
+        # deterministic time and randomness
+        random.seed(seed)
+        self.clock = timing.FixedClock(self.step_ms)
+        timing.use_clock(self.clock)
+
+        from level import Level
+        self.level = Level()
+
+    def step(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.finished = True
+        self.level.run(self.render)
+        self.clock.advance()
+        self.frame += 1
+
+        # the game quits once the player dies, so the run ends there too
+        if self.level.player.health <= 0:
+            self.finished = True
+
+    def run(self, frames):
+        for _ in range(frames):
+            if self.finished:
+                break
+            self.step()
+        return self.frame
+
+    def close(self):
+        self.level.close()
+        timing.use_clock(None)
+        pygame.quit()
+
+
+if __name__ == '__main__':
+    import sys
+    from time import perf_counter
+
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 3600
+    game = HeadlessGame(render='--no-render' not in sys.argv)
+    start = perf_counter()
+    game.run(frames)
+    elapsed = perf_counter() - start
+    print(f'{game.frame} frames in {elapsed:.2f}s ({game.frame / elapsed:.0f} fps)')
+    game.close()
@@ -4,12 +4,26 @@ from tile import Tile
 from player import Player
 from support import *
 from random import choice, randint
+from bisect import insort
+from heapq import merge, heapify, heappush, heappop
+from operator import itemgetter
 from weapon import Weapon
 from ui import UI
-from enemy import Enemy
-from particle import AnimationPlayer
+from enemy import Enemy, EnemyStore, StoredEnemy
+from particle import AnimationPlayer, ParticleSystem
 from magic import MagicPlayer
 from upgrade import Upgrade
+from spatial import SpatialGroup, AttackableGroup
+from assets import assets
+from mapcache import import_map_layer
+from chunks import StaticChunks
+import timing
+from debug import profiler
+from enemy_ai import EnemyBatch, EnemyPipeline, STATUSES, np
+from activity import EnemyActivity
+from dirty import DirtyTracker
+from streaming import WorldStream
+from pathfinding import FlowField
 
 
 class Level:
@@ -19,13 +33,19 @@ class Level:
         self.display_surface = pygame.display.get_surface()
         self.game_paused = False
         # sprite group setup
-        self.visible_sprites = YSortCameraGroup()
-        self.obstacle_sprites = pygame.sprite.Group()
+        self.visible_sprites = YSortCameraGroup(streamed=STREAM_WORLD)
+        self.obstacle_sprites = SpatialGroup()
 
         # attack sprites
         self.current_attack = None
         self.attack_sprites = pygame.sprite.Group()
-        self.attackable_sprites = pygame.sprite.Group()
+        self.attackable_sprites = AttackableGroup()
+
+        # enemies walk around obstacles along one field shared by all
+        self.flow_field = FlowField(self.obstacle_sprites) if FLOW_FIELD else None
+
+        # the state of every enemy in typed arrays, run in bulk
+        self.enemy_store = EnemyStore() if ENEMY_COMPONENTS else None
 
         # sprite setup
         self.create_map()
@@ -35,106 +55,147 @@ class Level:
         self.upgrade = Upgrade(self.player)
 
         #  particles
-        self.animation_player = AnimationPlayer()
+        self.animation_player = AnimationPlayer(self.visible_sprites.particles)
         self.magic_player = MagicPlayer(self.animation_player)
 
+        # redrawing only what changed since the last frame
+        self.dirty_tracker = DirtyTracker(self.display_surface.get_rect()) if DIRTY_RECTS else None
+        self.dirty_rects = None
+        self.profiler_shown = False
+
+        # positions of the last step are only kept when frames are drawn between steps
+        self.interpolate = False
+
     def create_map(self):
         layouts = {
-            'boundary': import_csv_layout('./map/map_FloorBlocks.csv'),
-            'grass': import_csv_layout('./map/map_Grass.csv'),
-            'object': import_csv_layout('./map/map_LargeObjects.csv'),
-            'entities': import_csv_layout('./map/map_Entities.csv')
+            'boundary': import_map_layer('./map/map_FloorBlocks.csv'),
+            'grass': import_map_layer('./map/map_Grass.csv'),
+            'object': import_map_layer('./map/map_LargeObjects.csv'),
+            'entities': import_map_layer('./map/map_Entities.csv')
         }
-        graphics = {
-            'grass': import_folder('./graphics/Grass'),
-            'objects': import_folder('./graphics/Objects')
+        self.graphics = {
+            'grass': assets.folder('./graphics/grass'),
+            'objects': assets.folder('./graphics/objects')
         }
-        for style, layout in layouts.items():
-            for row_index, row in enumerate(layout):
-                for col_index, col in enumerate(row):
-                    if col != '-1':
-                        x = col_index * TILESIZE
-                        y = row_index * TILESIZE
-                        if style == 'boundary':
-                            Tile((x, y), [self.obstacle_sprites], 'invisible')
-                        if style == 'grass':
-                            # create grass tile
-                            random_grass_image = choice(graphics['grass'])
-                            Tile(
-                                (x, y),
-                                [self.visible_sprites, self.obstacle_sprites, self.attackable_sprites],
-                                'grass',
-                                random_grass_image)
-                        if style == 'object':
-                            surface = graphics['objects'][int(col)]
-                            Tile((x, y), [self.visible_sprites, self.obstacle_sprites], 'object', surface)
-                        if style == 'entities':
-                            if col == '394':
-                                self.player = Player(
-                                    (x, y),
-                                    [self.visible_sprites],
-                                    self.obstacle_sprites,
-                                    self.create_attack,
-                                    self.destroy_attack,
-                                    self.create_magic)
-                            else:
-                                if col == '390':
-                                    monster_name = 'bamboo'
-                                elif col == '391':
-                                    monster_name = 'spirit'
-                                elif col == '392':
-                                    monster_name = 'raccoon'
-                                else:
-                                    monster_name = 'squid'
-
-                                Enemy(
-                                    monster_name,
-                                    (x, y),
-                                    [self.visible_sprites, self.attackable_sprites],
-                                    self.obstacle_sprites,
-                                    self.damage_player,
-                                    self.trigger_death_particles,
-                                    self.add_exp)
+        self.grass_images = {}
+        self.obstacle_sprites.set_walls(layouts['boundary'])
+
+        # a streamed world only has sprites in the chunks around the player
+        self.world_stream = None
+        if STREAM_WORLD:
+            for row_index, col_index, col in layouts['entities'].non_empty():
+                if col == 394:
+                    self.create_cell('entities', col_index * TILESIZE, row_index * TILESIZE, col)
+            self.world_stream = WorldStream(self, layouts, './graphics/tilemap/ground.png')
+            self.world_stream.update(self.player)
+
+        else:
+            for style, layout in layouts.items():
+                if style == 'boundary':
+                    continue
+                for row_index, col_index, col in layout.non_empty():
+                    self.create_cell(style, col_index * TILESIZE, row_index * TILESIZE, col)
+
+    def create_cell(self, style, x, y, col):
+        if style == 'grass':
+            # create grass tile, a streamed cell gets back the image it was first given
+            random_grass_image = self.grass_images.get((x, y))
+            if random_grass_image is None:
+                random_grass_image = self.grass_images[(x, y)] = choice(self.graphics['grass'])
+            return Tile(
+                (x, y),
+                [self.visible_sprites, self.obstacle_sprites, self.attackable_sprites],
+                'grass',
+                random_grass_image)
+        if style == 'object':
+            surface = self.graphics['objects'][col]
+            return Tile((x, y), [self.visible_sprites, self.obstacle_sprites], 'object', surface)
+        if style == 'entities':
+            if col == 394:
+                self.player = Player(
+                    (x, y),
+                    [self.visible_sprites],
+                    self.obstacle_sprites,
+                    self.create_attack,
+                    self.destroy_attack,
+                    self.create_magic)
+                return self.player
+            else:
+                if col == 390:
+                    monster_name = 'bamboo'
+                elif col == 391:
+                    monster_name = 'spirit'
+                elif col == 392:
+                    monster_name = 'raccoon'
+                else:
+                    monster_name = 'squid'
+                return self.spawn_enemy(monster_name, (x, y))
+
+    def spawn_enemy(self, monster_name, pos):
+        args = (
+            monster_name,
+            pos,
+            [self.visible_sprites, self.attackable_sprites],
+            self.obstacle_sprites,
+            self.damage_player,
+            self.trigger_death_particles,
+            self.add_exp,
+            self.flow_field)
+        if self.enemy_store:
+            return StoredEnemy(self.enemy_store, *args)
+        return Enemy(*args)
 
     def create_attack(self):
         self.current_attack = Weapon(self.player, [self.visible_sprites, self.attack_sprites])
 
     def create_magic(self, style, strength, cost):
         if style == 'heal':
-            self.magic_player.heal(self.player, strength, cost, [self.visible_sprites])
+            self.magic_player.heal(self.player, strength, cost)
 
         if style == 'flame':
-            self.magic_player.flame(self.player, strength, cost, [self.visible_sprites, self.attack_sprites])
+            self.magic_player.flame(self.player, strength, cost)
 
     def destroy_attack(self):
         if self.current_attack:
             self.current_attack.kill()
         self.current_attack = None
 
+    def attacks(self):
+        # weapons and flame particles hit in the order they were created
+        order = self.visible_sprites.order
+        attacks = [(order[sprite], sprite.rect, sprite.sprite_type) for sprite in self.attack_sprites]
+        attacks += [(seq, rect, 'magic') for seq, rect in self.visible_sprites.particles.attacks()]
+        attacks.sort(key=lambda attack: attack[0])
+        return attacks
+
     def player_attack_logic(self):
-        if self.attack_sprites:
-            for attack_sprite in self.attack_sprites:
-                collision_sprites = pygame.sprite.spritecollide(attack_sprite, self.attackable_sprites, False)
-                if collision_sprites:
-                    for target_sprite in collision_sprites:
-                        if target_sprite.sprite_type == 'grass':
-                            pos = target_sprite.rect.center
-                            offset = pygame.math.Vector2(0,60)
-                            for leaf in range(randint(2, 6)):
-                                self.animation_player.create_grass_particles(pos - offset, [self.visible_sprites])
-                            target_sprite.kill()
-                        elif target_sprite.sprite_type == 'enemy':
-                            target_sprite.get_damage(self.player, attack_sprite.sprite_type)
+        if self.attack_sprites or self.visible_sprites.particles:
+            # every attack is looked up at once, targets an earlier attack killed are skipped
+            attacks = self.attacks()
+            candidates = self.attackable_sprites.query([attack_rect for _, attack_rect, _ in attacks])
+            for (_, attack_rect, attack_type), collision_sprites in zip(attacks, candidates):
+                for target_sprite in collision_sprites:
+                    if not target_sprite.alive():
+                        continue
+                    if target_sprite.sprite_type == 'grass':
+                        pos = target_sprite.rect.center
+                        offset = pygame.math.Vector2(0,60)
+                        for leaf in range(randint(2, 6)):
+                            self.animation_player.create_grass_particles(pos - offset)
+                        target_sprite.kill()
+                    elif target_sprite.sprite_type == 'enemy':
+                        self.visible_sprites.wake(target_sprite)
+                        target_sprite.get_damage(self.player, attack_type)
 
     def damage_player(self, amount, attack_type):
         if self.player.vulnerable:
             self.player.health -= amount
             self.player.vulnerable = False
-            self.player.hurt_time = pygame.time.get_ticks()
-            self.animation_player.create_particles(attack_type, self.player.rect.center, [self.visible_sprites])
+            self.player.hurt_time = timing.get_ticks()
+            self.animation_player.create_particles(attack_type, self.player.rect.center)
 
     def trigger_death_particles(self, pos, particle_type):
-        self.animation_player.create_particles(particle_type, pos, self.visible_sprites)
+        self.animation_player.create_particles(particle_type, pos)
 
     def add_exp(self, amount):
         self.player.exp += amount
@@ -142,21 +203,81 @@ class Level:
     def toggle_menu(self):
         self.game_paused = not self.game_paused
 
-    def run(self):
-        self.visible_sprites.custom_draw(self.player)
+    def force_redraw(self):
+        if self.dirty_tracker:
+            self.dirty_tracker.invalidate()
+
+    def draw(self, alpha=None):
+        # alpha places the moving sprites between the last two steps,
+        # nothing moves while the menu is open
+        if self.game_paused:
+            alpha = None
+        floor_blits, blit_list = self.visible_sprites.frame_blits(self.player, alpha)
+
+        # the profiler overlay is drawn over the frame, so it and the
+        # frame after it are always redrawn in full
+        if self.dirty_tracker:
+            ui_rects = self.ui.dirty_rects(self.player) + self.upgrade.dirty_rects(self.game_paused)
+            if profiler.enabled or self.profiler_shown:
+                self.dirty_tracker.invalidate()
+            self.profiler_shown = profiler.enabled
+            elements = self.ui.element_rects() + self.upgrade.element_rects()
+            self.dirty_rects = self.dirty_tracker.update(self.visible_sprites.offset, floor_blits + blit_list, ui_rects, elements)
+
+        if self.dirty_rects is None:
+            self.draw_area(floor_blits, blit_list)
+        else:
+            for rect in self.dirty_rects:
+                self.display_surface.set_clip(rect)
+                self.draw_area(floor_blits, blit_list)
+            self.display_surface.set_clip(None)
+
+    def draw_area(self, floor_blits, blit_list):
+        self.display_surface.fill(WATER_COLOR)
+        self.visible_sprites.draw_blits(floor_blits, blit_list)
+        profiler.start('ui')
         self.ui.display(self.player)
+        profiler.stop('ui')
+        if self.game_paused:
+            self.upgrade.draw()
 
+    def update(self):
+        # one fixed step of the simulation
         if self.game_paused:
-            self.upgrade.display()
+            self.upgrade.update()
 
         else:
+            if self.world_stream:
+                self.world_stream.update(self.player)
+            if self.interpolate:
+                self.visible_sprites.remember_positions()
+            profiler.start('update')
             self.visible_sprites.update()
-            self.visible_sprites.enemy_update(self.player)
+            if self.enemy_store:
+                self.enemy_store.cooldowns(timing.get_ticks())
+            profiler.stop('update')
+            profiler.start('enemy update')
+            if self.flow_field:
+                self.flow_field.update(self.player)
+            self.visible_sprites.enemy_update(self.player, self.flow_field)
+            profiler.stop('enemy update')
+            profiler.start('attack logic')
             self.player_attack_logic()
+            profiler.stop('attack logic')
+
+    def close(self):
+        if self.visible_sprites.enemy_pipeline:
+            self.visible_sprites.enemy_pipeline.close()
+
+    def run(self, render=True):
+        # the simulation never reads anything the drawing does
+        if render:
+            self.draw()
+        self.update()
 
 
 class YSortCameraGroup(pygame.sprite.Group):
-    def __init__(self):
+    def __init__(self, streamed=False):
         # general setup
         super().__init__()
         self.display_surface = pygame.display.get_surface()
@@ -164,25 +285,335 @@ class YSortCameraGroup(pygame.sprite.Group):
         self.half_height = self.display_surface.get_size()[1] // 2
         self.offset = pygame.math.Vector2()
 
-        # creating the floor
-        self.floor_surface = pygame.image.load('./graphics/tilemap/ground.png').convert()
-        self.floor_rect = self.floor_surface.get_rect(topleft=(0, 0))
+        # creating the floor, a streamed world gets it one chunk at a time
+        if streamed:
+            self.floor_surface = None
+            self.floor_rect = None
+        else:
+            self.floor_surface = assets.image('./graphics/tilemap/ground.png', alpha=False)
+            self.floor_rect = self.floor_surface.get_rect(topleft=(0, 0))
+        self.floor_chunks = {}
+        self.floor_chunk_pixels = STATIC_CHUNK_SIZE * TILESIZE
+
+        # culling and depth setup
+        self.order = {}
+        self.sprite_count = 0
+        self.static_cells = {}
+        self.static_keys = {}
+        self.static_reach = [0, 0]
+        self.dynamic_sprites = []
+        self.drawn_sprites = 0
+        self.culled_sprites = 0
+
+        # particles live in flat arrays but share the depth order of the sprites
+        self.particles = ParticleSystem(self.next_order)
+
+        # static scenery baked into chunks
+        self.static_chunks = StaticChunks(self.floor_surface) if BAKE_STATIC_CHUNKS else None
+        self.particle_patches = {}
+        self.static_fronts = {}
+        self.patch_version = None
+
+        # where the moving sprites were one step ago
+        self.previous_positions = {}
+        self.alpha = None
+
+        # updated sprites and enemies in group order, sleepers left out
+        self.active_sprites = {}
+        self.enemy_sprites = {}
+        self.resort = False
+        self.enemy_batch = EnemyBatch() if BATCH_ENEMY_AI and np is not None else None
+        self.enemy_pipeline = EnemyPipeline() if ENEMY_AI_WORKERS else None
+        self.activity = EnemyActivity() if ENEMY_SLEEP else None
+
+    def next_order(self):
+        self.sprite_count += 1
+        return self.sprite_count
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.order[sprite] = self.next_order()
+
+        # tiles never move so they are kept sorted in the cell of their center
+        if isinstance(sprite, Tile):
+            key = (sprite.rect.centery, self.sprite_count, sprite)
+            cell = (sprite.rect.centerx // TILESIZE, sprite.rect.centery // TILESIZE)
+            insort(self.static_cells.setdefault(cell, []), key)
+            self.static_keys[sprite] = (cell, key)
+            if self.static_chunks:
+                self.static_chunks.add(key)
+            self.static_reach[0] = max(self.static_reach[0], sprite.rect.width // 2 + 1)
+            self.static_reach[1] = max(self.static_reach[1], sprite.rect.height // 2 + 1)
+        else:
+            self.dynamic_sprites.append(sprite)
+            self.active_sprites[sprite] = None
+            if isinstance(sprite, Enemy):
+                self.enemy_sprites[sprite] = None
+                if self.enemy_batch:
+                    self.enemy_batch.dirty = True
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        del self.order[sprite]
+        if sprite in self.static_keys:
+            cell, key = self.static_keys.pop(sprite)
+            self.static_cells[cell].remove(key)
+            if not self.static_cells[cell]:
+                del self.static_cells[cell]
+            if self.static_chunks:
+                self.static_chunks.remove(key)
+        else:
+            self.dynamic_sprites.remove(sprite)
+            self.active_sprites.pop(sprite, None)
+            if self.activity and sprite in self.activity.sleeping:
+                self.activity.forget(sprite)
+            if sprite in self.enemy_sprites:
+                del self.enemy_sprites[sprite]
+                if self.enemy_batch:
+                    self.enemy_batch.dirty = True
+
+    def static_sprites_in(self, view_rect):
+        # rows are visited top to bottom so the keys come out sorted
+        reach_x, reach_y = self.static_reach
+        left = (view_rect.left - reach_x) // TILESIZE
+        right = (view_rect.right + reach_x) // TILESIZE
+        top = (view_rect.top - reach_y) // TILESIZE
+        bottom = (view_rect.bottom + reach_y) // TILESIZE
+        for row in range(top, bottom + 1):
+            cells = [self.static_cells[(col, row)] for col in range(left, right + 1) if (col, row) in self.static_cells]
+            for key in merge(*cells):
+                if key[2].rect.colliderect(view_rect):
+                    yield key
+
+    def dynamic_sprites_in(self, view_rect):
+        # moving sprites are re-sorted in place, which is close to linear
+        # since their order barely changes from one frame to the next
+        order = self.order
+        self.dynamic_sprites.sort(key=lambda sprite: (sprite.rect.centery, order[sprite]))
+        return [(sprite.rect.centery, order[sprite], sprite) for sprite in self.dynamic_sprites if sprite.rect.colliderect(view_rect)]
+
+    def remember_positions(self):
+        self.previous_positions = {sprite: sprite.rect.topleft for sprite in self.dynamic_sprites}
+
+    def draw_rect(self, sprite):
+        # between the position of the last step and the current one
+        previous = self.previous_positions.get(sprite) if self.alpha is not None else None
+        if previous is None:
+            return sprite.rect
+        rect = sprite.rect
+        return rect.move(round((previous[0] - rect.x) * (1 - self.alpha)), round((previous[1] - rect.y) * (1 - self.alpha)))
 
-    def custom_draw(self, player):
+    def custom_draw(self, player, alpha=None):
+        floor_blits, blit_list = self.frame_blits(player, alpha)
+        self.draw_blits(floor_blits, blit_list)
+
+    def frame_blits(self, player, alpha=None):
         # getting the offset
-        self.offset.x = player.rect.centerx - self.half_width
-        self.offset.y = player.rect.centery - self.half_height
-
-        # drawing the floor
-        floor_offset_pos = self.floor_rect.topleft - self.offset
-        self.display_surface.blit(self.floor_surface, floor_offset_pos)
-
-        # for sprite in self.sprites():
-        for sprite in sorted(self.sprites(), key=lambda sprite: sprite.rect.centery):
-            offset_position = sprite.rect.topleft - self.offset
-            self.display_surface.blit(sprite.image, offset_position)
-
-    def enemy_update(self, player):
-        enemy_sprites = [sprite for sprite in self.sprites() if hasattr(sprite, 'sprite_type') and sprite.sprite_type == 'enemy']
-        for enemy in enemy_sprites:
-            enemy.enemy_update(player)  # 3h49min30
+        self.alpha = alpha
+        player_rect = self.draw_rect(player)
+        self.offset.x = player_rect.centerx - self.half_width
+        self.offset.y = player_rect.centery - self.half_height
+
+        # culling the sprites outside of the camera
+        profiler.start('sprite sort')
+        screen_rect = self.display_surface.get_rect(topleft=self.offset)
+        view_rect = screen_rect.inflate(CAMERA_MARGIN * 2, CAMERA_MARGIN * 2)
+        dynamic_keys = self.dynamic_sprites_in(view_rect)
+        particle_keys = self.particles.keys_in(view_rect)
+        if self.static_chunks:
+            blit_list = self.blits_over_chunks(dynamic_keys, particle_keys)
+        else:
+            blit_list = self.sorted_blits(view_rect, dynamic_keys, particle_keys)
+
+        # the baked chunks carry the floor with them
+        if self.static_chunks:
+            floor_blits, drawn = self.static_chunks.blits(self.offset, screen_rect)
+            drawn += len(dynamic_keys) + len(particle_keys)
+        else:
+            floor_blits = self.floor_blits()
+            drawn = len(blit_list)
+        profiler.stop('sprite sort')
+
+        self.drawn_sprites = drawn
+        self.culled_sprites = len(self.order) + len(self.particles) - drawn
+        return floor_blits, blit_list
+
+    def floor_blits(self):
+        if self.floor_surface:
+            return [(self.floor_surface, self.floor_rect.topleft - self.offset)]
+        size = self.floor_chunk_pixels
+        return [(surface, (chunk[0] * size - self.offset.x, chunk[1] * size - self.offset.y)) for chunk, surface in self.floor_chunks.items()]
+
+    def set_floor_chunk(self, chunk, surface):
+        if surface is None:
+            self.floor_chunks.pop(chunk, None)
+        else:
+            self.floor_chunks[chunk] = surface
+        if self.static_chunks:
+            self.static_chunks.set_floor(chunk, surface)
+
+    def draw_blits(self, floor_blits, blit_list):
+        profiler.start('floor blit')
+        self.display_surface.blits(floor_blits, False)
+        profiler.stop('floor blit')
+
+        profiler.start('sprite blit')
+        self.display_surface.blits(blit_list, False)
+        profiler.stop('sprite blit')
+
+    def sorted_blits(self, view_rect, dynamic_keys, particle_keys):
+        # ties keep the group order like a stable sort would, particle keys
+        # end with their slot instead of a sprite and keep their own order
+        blit_list = []
+        particle_blits = iter(self.particles.blits([key[2] for key in particle_keys], self.offset))
+        for key in merge(self.static_sprites_in(view_rect), dynamic_keys, particle_keys):
+            item = key[2]
+            if item.__class__ is int:
+                blit_list.append(next(particle_blits))
+            else:
+                blit_list.append((item.image, self.draw_rect(item).topleft - self.offset))
+        return blit_list
+
+    def blits_over_chunks(self, dynamic_keys, particle_keys):
+        entries = []
+        for key in dynamic_keys:
+            sprite = key[2]
+            rect = self.draw_rect(sprite)
+            entries.append(((key[0], key[1], len(entries)), (sprite.image, rect.topleft - self.offset)))
+            self.patch_statics(entries, key, rect)
+
+        # particles come sorted already and their blits are made in one go
+        start = len(entries)
+        blits = self.particles.blits([key[2] for key in particle_keys], self.offset)
+        entries += [((key[0], key[1], start + index), blit) for index, (key, blit) in enumerate(zip(particle_keys, blits))]
+
+        # a tile in front of particles is redrawn once over all of them
+        offset_x, offset_y = self.offset
+        for static_key, region in self.particle_regions(particle_keys):
+            static = static_key[2]
+            area = region.move(-static.rect.x, -static.rect.y)
+            entries.append(((static_key[0], static_key[1], len(entries)), (static.image, (region.x - offset_x, region.y - offset_y), area)))
+
+        entries.sort(key=itemgetter(0))
+        return [entry[1] for entry in entries]
+
+    def particle_regions(self, particle_keys):
+        # particles never move, so the tiles in front of them are only looked
+        # up again once the tiles change
+        if self.patch_version != self.static_chunks.version:
+            self.patch_version = self.static_chunks.version
+            self.particle_patches = {}
+            self.static_fronts = {}
+        cached = self.particle_patches
+        patches = {}
+        regions = {}
+        for key in particle_keys:
+            particle_patches = cached.get(key[1])
+            if particle_patches is None:
+                rect = self.particles.visible_rect(key[2])
+                particle_patches = tuple((static_key, static_key[2].rect.clip(rect)) for static_key in self.static_chunks.in_front(key, rect))
+            patches[key[1]] = particle_patches
+            for static_key, clip in particle_patches:
+                region = regions.get(static_key[1])
+                if region is None:
+                    regions[static_key[1]] = (static_key, clip.copy())
+                else:
+                    region[1].union_ip(clip)
+        self.particle_patches = patches
+
+        # the union covers more than the particles, so the tiles in front of
+        # a redrawn tile are redrawn over it too, nearest first
+        fronts = self.static_fronts
+        heap = [static_key[:2] for static_key, _ in regions.values()]
+        heapify(heap)
+        while heap:
+            static_key, region = regions[heappop(heap)[1]]
+            front_keys = fronts.get(static_key[1])
+            if front_keys is None:
+                front_keys = fronts[static_key[1]] = tuple(self.static_chunks.in_front(static_key, static_key[2].rect))
+            for front_key in front_keys:
+                clip = region.clip(front_key[2].rect)
+                if not clip.width or not clip.height:
+                    continue
+                front = regions.get(front_key[1])
+                if front is None:
+                    regions[front_key[1]] = (front_key, clip)
+                    heappush(heap, front_key[:2])
+                else:
+                    front[1].union_ip(clip)
+        return regions.values()
+
+    def patch_statics(self, entries, key, rect):
+        # the part of a tile standing in front of the sprite goes above it again
+        for depth, order, image, topleft, area in self.static_patches(key, rect):
+            entries.append(((depth, order, len(entries)), (image, topleft - self.offset, area)))
+
+    def static_patches(self, key, rect):
+        patches = []
+        for static_key in self.static_chunks.in_front(key, rect):
+            static = static_key[2]
+            clip = static.rect.clip(rect)
+            area = clip.move(-static.rect.x, -static.rect.y)
+            patches.append((static_key[0], static_key[1], static.image, clip.topleft, area))
+        return tuple(patches)
+
+    def sort_active(self):
+        order = self.order
+        self.active_sprites = dict.fromkeys(sorted(self.active_sprites, key=order.get))
+        self.enemy_sprites = dict.fromkeys(sorted(self.enemy_sprites, key=order.get))
+        self.resort = False
+
+    def sleep(self, enemy, player):
+        del self.active_sprites[enemy]
+        del self.enemy_sprites[enemy]
+        self.activity.sleep(enemy, player)
+        if self.enemy_batch:
+            self.enemy_batch.dirty = True
+
+    def wake(self, enemy):
+        if self.activity and enemy in self.activity.sleeping:
+            self.activity.wake(enemy)
+            self.active_sprites[enemy] = None
+            self.enemy_sprites[enemy] = None
+            self.resort = True
+            if self.enemy_batch:
+                self.enemy_batch.dirty = True
+
+    def update(self, *args):
+        # tiles have nothing to update and sleeping enemies catch up later
+        if self.activity:
+            self.activity.tick()
+        if self.resort:
+            self.sort_active()
+        self.particles.update()
+        for sprite in list(self.active_sprites):
+            sprite.update(*args)
+
+    def enemy_update(self, player, flow_field=None):
+        if self.activity:
+            for enemy in self.activity.due(player):
+                self.wake(enemy)
+        if self.resort:
+            self.sort_active()
+
+        if self.enemy_pipeline:
+            # the decisions made on the last step are applied to the enemies
+            # still active, while the workers decide on this one during the drawing
+            enemies, decisions = self.enemy_pipeline.collect()
+            for enemy, (code, direction) in zip(enemies, decisions):
+                if enemy in self.enemy_sprites:
+                    if code == 2 and not enemy.can_attack:
+                        code = 1
+                    enemy.set_status(STATUSES[code])
+                    enemy.actions(player, pygame.math.Vector2(direction), steered=True)
+            self.enemy_pipeline.submit(self.enemy_sprites, player, flow_field)
+        elif self.enemy_batch:
+            self.enemy_batch.update(self.enemy_sprites, player)
+        else:
+            for enemy in list(self.enemy_sprites):
+                enemy.enemy_update(player)  # 3h49min30
+
+        # idle enemies far from the player stop being updated
+        if self.activity:
+            for enemy in [enemy for enemy in self.enemy_sprites if self.activity.can_sleep(enemy, player)]:
+                self.sleep(enemy, player)
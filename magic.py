@@ -1,28 +1,27 @@
 import pygame
 from settings import *
 from random import randint
+from assets import assets
 
 
 class MagicPlayer:
     def __init__(self, animation_player):
         self.animation_player = animation_player
         self.sounds = {
-            'heal': pygame.mixer.Sound('./audio/heal.wav'),
-            'flame': pygame.mixer.Sound('./audio/fire.wav')
+            'heal': assets.sound('./audio/heal.wav', 0.05),
+            'flame': assets.sound('./audio/Fire.wav', 0.05)
         }
-        self.sounds['heal'].set_volume(0.05)
-        self.sounds['flame'].set_volume(0.05)
 
-    def heal(self, player, strength, cost, groups):
+    def heal(self, player, strength, cost):
         if player.mana >= cost and player.health < player.stats['health']:
             self.sounds['heal'].play()
             player.health += strength
             player.mana -= cost
             player.health = min(player.health, player.stats['health'])
-            self.animation_player.create_particles('aura', player.rect.center, groups)
-            self.animation_player.create_particles('heal', player.rect.center + pygame.math.Vector2(0, -60), groups)
+            self.animation_player.create_particles('aura', player.rect.center)
+            self.animation_player.create_particles('heal', player.rect.center + pygame.math.Vector2(0, -60))
 
-    def flame(self, player, strength, cost, groups):
+    def flame(self, player, strength, cost):
         if player.mana >= cost:
             self.sounds['flame'].play()
             player.mana -= cost
@@ -41,9 +40,9 @@ class MagicPlayer:
                     offset_x = (direction.x * i) * TILESIZE
                     x = player.rect.centerx + offset_x + randint(-TILESIZE // 4, TILESIZE // 4)
                     y = player.rect.centery + randint(-TILESIZE // 4, TILESIZE // 4)
-                    self.animation_player.create_particles('flame', (x, y), groups)
+                    self.animation_player.create_particles('flame', (x, y), attack=True)
                 elif direction.y:  # vertical
                     offset_y = (direction.y * i) * TILESIZE
                     x = player.rect.centerx + randint(-TILESIZE // 4, TILESIZE // 4)
                     y = player.rect.centery + offset_y + randint(-TILESIZE // 4, TILESIZE // 4)
-                    self.animation_player.create_particles('flame', (x, y), groups)
+                    self.animation_player.create_particles('flame', (x, y), attack=True)
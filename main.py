@@ -1,18 +1,43 @@
 import pygame, sys
+import json
+import random
+from time import perf_counter
 from settings import *
 from level import *
+from debug import profiler
+from assets import assets
+from replay import InputRecorder
+import timing
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, record_path=None):
 
         #general setup
         pygame.init()
+
+        # images start decoding while the window comes up
+        assets.preload([path for path in PRELOAD_ASSETS if not (STREAM_WORLD and path.endswith('ground.png'))])
         self.screen = pygame.display.set_mode((WIDTH, HEIGTH))
         pygame.display.set_caption('Turbo Hunter Tactics')
         self.clock = pygame.time.Clock()
 
+        # the simulation has its own clock that only moves in fixed steps
+        self.sim_clock = timing.FixedClock()
+        timing.use_clock(self.sim_clock)
+
+        # a recorded session starts from a known seed so it can be replayed
+        self.record_path = record_path
+        self.recorder = None
+        if record_path:
+            seed = random.randrange(1 << 32)
+            random.seed(seed)
+            self.recorder = InputRecorder(seed, self.sim_clock.step)
+
         self.level = Level()
+        self.level.interpolate = True
+        if ASSET_REPORT:
+            print(json.dumps(assets.report(), indent=2))
 
         # sound
         main_sound = pygame.mixer.Sound('./audio/main.ogg')
@@ -20,19 +45,61 @@ class Game:
         main_sound.play(loops=-1)
 
     def run(self):
+        step = self.sim_clock.step
+        accumulator = 0.0
+        previous = perf_counter()
         while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    return
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_m:
                         self.level.toggle_menu()
-            self.screen.fill(WATER_COLOR)
-            self.level.run()
-            pygame.display.update()
-            self.clock.tick(FPS)
+                        if self.recorder:
+                            self.recorder.event('menu')
+                    if event.key == pygame.K_F3:
+                        profiler.toggle()
+                if event.type == pygame.VIDEOEXPOSE:
+                    self.level.force_redraw()
+            now = perf_counter()
+            accumulator += (now - previous) * 1000
+            previous = now
+
+            # slow frames are caught up a few steps at most, the rest is
+            # dropped so the game slows down instead of falling further behind
+            steps = 0
+            while accumulator >= step:
+                if steps == MAX_CATCH_UP_STEPS:
+                    accumulator %= step
+                    break
+                if self.recorder:
+                    self.recorder.capture()
+                self.level.update()
+                self.sim_clock.advance()
+                if self.recorder:
+                    self.recorder.stepped(self.level)
+                accumulator -= step
+                steps += 1
+
+            self.level.draw(accumulator / step)
+            profiler.display()
+            if self.level.dirty_rects is None:
+                pygame.display.update()
+            else:
+                pygame.display.update(self.level.dirty_rects)
+            self.clock.tick(RENDER_FPS)
+
+    def close(self):
+        if self.recorder:
+            self.recorder.save(self.record_path, self.level)
+        self.level.close()
+        pygame.quit()
 
 if __name__ == '__main__':
-    game = Game()
-    game.run()
+    game = Game(sys.argv[sys.argv.index('--record') + 1] if '--record' in sys.argv else None)
+    # the recording is written even when the game crashes or is interrupted
+    try:
+        game.run()
+    finally:
+        game.close()
+    sys.exit()
@@ -0,0 +1,130 @@
+import os
+import mmap
+import struct
+from array import array
+from hashlib import sha1
+from csv import reader
+from settings import *
+
+# file layout: header, the full grid, then the flat index of every non empty cell
+HEADER = struct.Struct('=4sIIIqq20sI12x')
+MAGIC = b'ZMAP'
+VERSION = 1
+EMPTY = -1
+
+
+class MapLayer:
+    def __init__(self, rows, cols, grid, cells, source=None):
+        self.rows = rows
+        self.cols = cols
+        self.grid = grid
+        self.cells = cells
+
+        # keeps the mapped file alive as long as the views
+        self.source = source
+
+    def value(self, row, col):
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return self.grid[row * self.cols + col]
+        return EMPTY
+
+    def non_empty(self):
+        cols = self.cols
+        grid = self.grid
+        for index in self.cells:
+            yield index // cols, index % cols, grid[index]
+
+
+def compile_layout(path):
+    grid = array('i')
+    rows = 0
+    cols = 0
+    with open(path) as level_map:
+        parsed = [row for row in reader(level_map, delimiter=',')]
+    for row in parsed:
+        cols = max(cols, len(row))
+    for row in parsed:
+        grid.extend(int(col) for col in row)
+        grid.extend([EMPTY] * (cols - len(row)))
+        rows += 1
+    cells = array('i', (index for index, value in enumerate(grid) if value != EMPTY))
+    return rows, cols, grid, cells
+
+
+def cache_path(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(MAP_CACHE_FOLDER, name + '.bin')
+
+
+def source_digest(path):
+    with open(path, 'rb') as source:
+        return sha1(source.read()).digest()
+
+
+def write_cache(path, target, rows, cols, grid, cells):
+    stat = os.stat(path)
+    header = HEADER.pack(MAGIC, VERSION, rows, cols, stat.st_mtime_ns, stat.st_size, source_digest(path), len(cells))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temporary = target + '.tmp'
+    with open(temporary, 'wb') as cache:
+        cache.write(header)
+        cache.write(grid.tobytes())
+        cache.write(cells.tobytes())
+    os.replace(temporary, target)
+
+
+def read_header(target):
+    try:
+        with open(target, 'rb') as cache:
+            data = cache.read(HEADER.size)
+    except OSError:
+        return None
+    if len(data) != HEADER.size:
+        return None
+    header = HEADER.unpack(data)
+    if header[0] != MAGIC or header[1] != VERSION:
+        return None
+    return header
+
+
+def is_fresh(path, target, header):
+    stat = os.stat(path)
+    mtime_ns, size, digest = header[4], header[5], header[6]
+    if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+        return True
+
+    # the file was touched, only a content change invalidates the cache
+    if stat.st_size == size and source_digest(path) == digest:
+        try:
+            with open(target, 'r+b') as cache:
+                cache.write(HEADER.pack(*header[:4], stat.st_mtime_ns, *header[5:]))
+        except OSError:
+            # read only install, the layer is compiled again in memory
+            return False
+        return True
+    return False
+
+
+def map_cache(target, header):
+    rows, cols, cell_count = header[2], header[3], header[7]
+    with open(target, 'rb') as cache:
+        mapped = mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    grid_end = HEADER.size + rows * cols * 4
+    grid = view[HEADER.size:grid_end].cast('i')
+    cells = view[grid_end:grid_end + cell_count * 4].cast('i')
+    return MapLayer(rows, cols, grid, cells, mapped)
+
+
+def import_map_layer(path):
+    target = cache_path(path)
+    header = read_header(target)
+    if header is None or not is_fresh(path, target, header):
+        compiled = compile_layout(path)
+        try:
+            write_cache(path, target, *compiled)
+        except OSError:
+            # read only install, keep the compiled layer in memory
+            return MapLayer(*compiled)
+        header = read_header(target)
+    return map_cache(target, header)
@@ -1,81 +1,225 @@
 import pygame
-from support import import_folder
+from array import array
+from assets import assets
 from random import choice
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# the folder of every particle set, leafs fall from six folders and their mirrors
+PARTICLE_FOLDERS = {
+    # magic
+    'flame': './graphics/particles/flame/frames',
+    'aura': './graphics/particles/aura',
+    'heal': './graphics/particles/heal/frames',
+
+    # attacks
+    'claw': './graphics/particles/claw',
+    'slash': './graphics/particles/slash',
+    'sparkle': './graphics/particles/sparkle',
+    'leaf_attack': './graphics/particles/leaf_attack',
+    'thunder': './graphics/particles/thunder',
+
+    # monster deaths
+    'squid': './graphics/particles/smoke_orange',
+    'raccoon': './graphics/particles/raccoon',
+    'spirit': './graphics/particles/nova',
+    'bamboo': './graphics/particles/bamboo'}
+LEAF_FOLDERS = tuple(f'./graphics/particles/leaf{index}' for index in range(1, 7))
+
 
 class AnimationPlayer:
-    def __init__(self):
-        self.frames = {
-            # magic
-            'flame': import_folder('./graphics/particles/flame/frames'),
-            'aura': import_folder('./graphics/particles/aura'),
-            'heal': import_folder('./graphics/particles/heal/frames'),
-
-            # attacks
-            'claw': import_folder('./graphics/particles/claw'),
-            'slash': import_folder('./graphics/particles/slash'),
-            'sparkle': import_folder('./graphics/particles/sparkle'),
-            'leaf_attack': import_folder('./graphics/particles/leaf_attack'),
-            'thunder': import_folder('./graphics/particles/thunder'),
-
-            # monster deaths
-            'squid': import_folder('./graphics/particles/smoke_orange'),
-            'raccoon': import_folder('./graphics/particles/raccoon'),
-            'spirit': import_folder('./graphics/particles/nova'),
-            'bamboo': import_folder('./graphics/particles/bamboo'),
-
-            # leafs
-            'leaf': (
-                import_folder('./graphics/particles/leaf1'),
-                import_folder('./graphics/particles/leaf2'),
-                import_folder('./graphics/particles/leaf3'),
-                import_folder('./graphics/particles/leaf4'),
-                import_folder('./graphics/particles/leaf5'),
-                import_folder('./graphics/particles/leaf6'),
-                self.reflect_images(import_folder('./graphics/particles/leaf1')),
-                self.reflect_images(import_folder('./graphics/particles/leaf2')),
-                self.reflect_images(import_folder('./graphics/particles/leaf3')),
-                self.reflect_images(import_folder('./graphics/particles/leaf4')),
-                self.reflect_images(import_folder('./graphics/particles/leaf5')),
-                self.reflect_images(import_folder('./graphics/particles/leaf6'))
-            )
-        }
-
-    def reflect_images(self, frames):
-        new_frames = []
+    def __init__(self, particles):
+        self.particles = particles
 
-        for frame in frames:
-            flipped_frame = pygame.transform.flip(frame, True, False)
-            new_frames.append(flipped_frame)
-        return new_frames
+        # most sets are rarely seen, so each is loaded the first time it plays
+        self.frames = {}
 
-    def create_grass_particles(self, pos, groups):
-        animation_frames = choice(self.frames['leaf'])
-        ParticleEffect(pos, animation_frames, groups)
+    def frames_of(self, attack_type):
+        frames = self.frames.get(attack_type)
+        if frames is None:
+            if attack_type == 'leaf':
+                frames = tuple(assets.folder(path) for path in LEAF_FOLDERS) + tuple(assets.flipped(path) for path in LEAF_FOLDERS)
+            else:
+                frames = assets.folder(PARTICLE_FOLDERS[attack_type])
+            self.frames[attack_type] = frames
+        return frames
 
-    def create_particles(self, attack_type, pos, groups):
-        animation_frames = self.frames[attack_type]
-        ParticleEffect(pos, animation_frames, groups)
+    def create_grass_particles(self, pos):
+        animation_frames = choice(self.frames_of('leaf'))
+        self.particles.spawn(animation_frames, pos)
 
+    def create_particles(self, attack_type, pos, attack=False):
+        animation_frames = self.frames_of(attack_type)
+        self.particles.spawn(animation_frames, pos, attack)
 
 
+class ParticleSystem:
+    def __init__(self, next_order, animation_speed=0.15):
+        self.next_order = next_order
+        self.animation_speed = animation_speed
 
-class ParticleEffect(pygame.sprite.Sprite):
-    def __init__(self, pos, animation_frames, groups):
-        super().__init__(groups)
-        self.sprite_type = 'magic'
-        self.frame_index = 0
-        self.animation_speed = 0.15
-        self.frames = animation_frames
-        self.image = self.frames[self.frame_index]
-        self.rect = self.image.get_rect(center=pos)
+        # frame lists are shared by every particle playing them, each frame
+        # cropped to its visible pixels so the blits skip the empty ones
+        self.tables = []
+        self.table_ids = {}
+        self.lengths = array('i')
+        self.bounds = []
+
+        # every frame of every table in one list, a table starts at its first
+        # frame, so the frame of a particle is found without a python loop
+        self.images = []
+        self.starts = array('i')
+        self.image_x = array('i')
+        self.image_y = array('i')
+
+        # one slot per live particle, kept in spawn order
+        self.x = array('i')
+        self.y = array('i')
+        self.width = array('i')
+        self.height = array('i')
+        self.depth = array('i')
+        self.order = array('q')
+        self.table = array('H')
+        self.frame = array('d')
+        self.attack = array('b')
+        self.columns = (self.x, self.y, self.width, self.height, self.depth, self.order, self.table, self.frame, self.attack)
+
+    def __len__(self):
+        return len(self.order)
+
+    def table_index(self, frames):
+        # the frame list is kept with its index so its id can not be reused
+        entry = self.table_ids.get(id(frames))
+        if entry is None:
+            entry = self.table_ids[id(frames)] = (len(self.tables), frames)
+            table, bound = self.crop(frames)
+            self.tables.append(table)
+            self.lengths.append(len(table))
+            self.bounds.append(bound)
+            self.starts.append(len(self.images))
+            for image, x, y in table:
+                self.images.append(image)
+                self.image_x.append(x)
+                self.image_y.append(y)
+        return entry[0]
+
+    def crop(self, frames):
+        table = []
+        bounds = []
+        for frame in frames:
+            bound = frame.get_bounding_rect()
+            table.append((frame.subsurface(bound), bound.x, bound.y))
+            if bound.width and bound.height:
+                bounds.append(bound)
+        return table, bounds[0].unionall(bounds[1:]) if bounds else pygame.Rect(0, 0, 0, 0)
 
-    def animate(self):
-        self.frame_index += self.animation_speed
-        if self.frame_index >= len(self.frames):
-            self.kill()
-        else:
-            self.image = self.frames[int(self.frame_index)]
+    def spawn(self, frames, pos, attack=False):
+        # the rect is set by the first frame and never moves
+        rect = frames[0].get_rect(center=pos)
+        self.x.append(rect.x)
+        self.y.append(rect.y)
+        self.width.append(rect.width)
+        self.height.append(rect.height)
+        self.depth.append(rect.centery)
+        self.order.append(self.next_order())
+        self.table.append(self.table_index(frames))
+        self.frame.append(0.0)
+        self.attack.append(attack)
 
     def update(self):
-        self.animate()
+        speed = self.animation_speed
+        if np is not None:
+            frame = np.frombuffer(self.frame, 'd')
+            frame += speed
+            alive = frame < np.frombuffer(self.lengths, 'i')[np.frombuffer(self.table, 'H')]
+            del frame
+            if not alive.all():
+                self.compact(alive)
+            return
+
+        lengths = self.lengths
+        table = self.table
+        frame = self.frame
+        alive = []
+        for index in range(len(frame)):
+            frame[index] += speed
+            alive.append(frame[index] < lengths[table[index]])
+        if not all(alive):
+            self.compact(alive)
+
+    def compact(self, alive):
+        # finished particles are dropped by moving the live ones down in place
+        if np is not None:
+            count = int(np.count_nonzero(alive))
+            for column in self.columns:
+                values = np.frombuffer(column, column.typecode)
+                values[:count] = values[alive]
+                del values
+                del column[count:]
+            return
+
+        count = 0
+        for index, keep in enumerate(alive):
+            if keep:
+                if count != index:
+                    for column in self.columns:
+                        column[count] = column[index]
+                count += 1
+        for column in self.columns:
+            del column[count:]
+
+    def rect(self, index):
+        return pygame.Rect(self.x[index], self.y[index], self.width[index], self.height[index])
+
+    def visible_rect(self, index):
+        return self.bounds[self.table[index]].move(self.x[index], self.y[index])
+
+    def attacks(self):
+        if np is not None:
+            return [(self.order[index], self.rect(index)) for index in np.flatnonzero(np.frombuffer(self.attack, 'b')).tolist()]
+        return [(self.order[index], self.rect(index)) for index in range(len(self.order)) if self.attack[index]]
+
+    def table_views(self, view):
+        # the view is moved into the frame of each table instead of the other way round
+        return [(view[0] - bound.right, view[1] - bound.bottom, view[2] - bound.left, view[3] - bound.top) if bound.width else (0, 0, 0, 0) for bound in self.bounds]
+
+    def keys_in(self, view_rect):
+        # (depth, order, index) of the particles in view, sorted like the sprites
+        view = (view_rect.left, view_rect.top, view_rect.right, view_rect.bottom)
+        if np is not None:
+            views = np.array(self.table_views(view), 'i').reshape(-1, 4)[np.frombuffer(self.table, 'H')]
+            x = np.frombuffer(self.x, 'i')
+            y = np.frombuffer(self.y, 'i')
+            depth = np.frombuffer(self.depth, 'i')
+            visible = np.flatnonzero((views[:, 0] < x) & (x < views[:, 2]) & (views[:, 1] < y) & (y < views[:, 3]))
+            visible = visible[np.argsort(depth[visible], kind='stable')]
+            return list(zip(depth[visible].tolist(), np.frombuffer(self.order, 'q')[visible].tolist(), visible.tolist()))
+
+        x, y, table, depth, order = self.x, self.y, self.table, self.depth, self.order
+        views = self.table_views(view)
+        visible = []
+        for index in range(len(order)):
+            left, top, right, bottom = views[table[index]]
+            if left < x[index] < right and top < y[index] < bottom:
+                visible.append(index)
+        visible.sort(key=depth.__getitem__)
+        return [(depth[index], order[index], index) for index in visible]
+
+    def blit(self, index, offset):
+        image, x, y = self.tables[self.table[index]][int(self.frame[index])]
+        return (image, (self.x[index] + x - offset.x, self.y[index] + y - offset.y))
+
+    def blits(self, indices, offset):
+        # the blits of many particles at once
+        if np is None or not indices:
+            return [self.blit(index, offset) for index in indices]
+        indices = np.array(indices, np.intp)
+        frames = np.frombuffer(self.starts, 'i')[np.frombuffer(self.table, 'H')[indices]] + np.frombuffer(self.frame, 'd')[indices].astype(np.intp)
+        x = (np.frombuffer(self.x, 'i')[indices] + np.frombuffer(self.image_x, 'i')[frames] - offset.x).tolist()
+        y = (np.frombuffer(self.y, 'i')[indices] + np.frombuffer(self.image_y, 'i')[frames] - offset.y).tolist()
+        images = self.images
+        return [(images[frame], position) for frame, position in zip(frames.tolist(), zip(x, y))]
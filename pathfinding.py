@@ -0,0 +1,96 @@
+import pygame
+from heapq import heappush, heappop
+from settings import *
+
+# steps to the eight neighbours with their costs, diagonals cost about sqrt(2)
+STEPS = ((1, 0, 2), (-1, 0, 2), (0, 1, 2), (0, -1, 2), (1, 1, 3), (1, -1, 3), (-1, 1, 3), (-1, -1, 3))
+
+
+class FlowField:
+    def __init__(self, obstacle_sprites, reach=FLOW_FIELD_RANGE):
+        self.obstacle_sprites = obstacle_sprites
+        self.reach = reach
+
+        # the next cell on the way to the player for every cell in reach
+        self.next_cell = {}
+        self.goal = None
+        self.version = None
+        self.builds = 0
+
+        # blocked cells seen so far, forgotten when the obstacles change
+        self.blocked = {}
+
+    def cell_of(self, pos):
+        return (int(pos[0]) // TILESIZE, int(pos[1]) // TILESIZE)
+
+    def update(self, player):
+        # rebuilt only when the player changes tile or an obstacle comes or goes
+        goal = self.cell_of(player.hitbox.center)
+        version = self.obstacle_sprites.version
+        if goal == self.goal and version == self.version:
+            return
+        if version != self.version:
+            self.blocked = {}
+        self.goal = goal
+        self.version = version
+        self.build(goal)
+
+    def is_blocked(self, cell):
+        blocked = self.blocked.get(cell)
+        if blocked is None:
+            blocked = self.blocked[cell] = self.obstacle_sprites.is_blocked(*cell)
+        return blocked
+
+    def build(self, goal):
+        # dijkstra from the player, the cell a cell was reached from is its next step
+        blocked = self.is_blocked
+        limit = self.reach * 2
+        cost = {goal: 0}
+        next_cell = {}
+        heap = [(0, goal)]
+        while heap:
+            current_cost, cell = heappop(heap)
+            if current_cost > cost[cell]:
+                continue
+            x, y = cell
+            for step_x, step_y, step_cost in STEPS:
+                neighbour = (x + step_x, y + step_y)
+                new_cost = current_cost + step_cost
+                if new_cost > limit or new_cost >= cost.get(neighbour, limit + 1):
+                    continue
+                if blocked(neighbour):
+                    continue
+
+                # no cutting corners past a blocked cell
+                if step_x and step_y and (blocked((x + step_x, y)) or blocked((x, y + step_y))):
+                    continue
+                cost[neighbour] = new_cost
+                next_cell[neighbour] = cell
+                heappush(heap, (new_cost, neighbour))
+        self.next_cell = next_cell
+        self.builds += 1
+
+    def direction(self, pos, straight, speed):
+        return steer(self.next_cell, self.goal, pos, straight, speed)
+
+
+def steer(next_cells, goal, pos, straight, speed):
+    # a plain function of the field, so it can also run off the main thread.
+    # the straight line is kept next to the player and out of reach
+    next_cell = next_cells.get((int(pos[0]) // TILESIZE, int(pos[1]) // TILESIZE))
+    if next_cell is None or next_cell == goal:
+        return straight
+    target = pygame.math.Vector2((next_cell[0] + 0.5) * TILESIZE, (next_cell[1] + 0.5) * TILESIZE)
+    delta = target - pos
+    if delta.magnitude() == 0:
+        return straight
+
+    # positions are rounded to whole pixels, so on a straight step the hitbox
+    # is lined up with the next cell first instead of losing the sideways part
+    if next_cell[0] == int(pos[0]) // TILESIZE:
+        side = max(-speed, min(delta.x, speed))
+        return pygame.math.Vector2(side, (speed ** 2 - side ** 2) ** 0.5 * (1 if delta.y > 0 else -1)) / speed
+    if next_cell[1] == int(pos[1]) // TILESIZE:
+        side = max(-speed, min(delta.y, speed))
+        return pygame.math.Vector2((speed ** 2 - side ** 2) ** 0.5 * (1 if delta.x > 0 else -1), side) / speed
+    return delta.normalize()
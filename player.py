@@ -1,14 +1,16 @@
 import pygame
 from settings import *
-from support import import_folder
+from assets import assets
 from debug import *
 from entity import Entity
+import timing
+import controls
 
 
 class Player(Entity):
     def __init__(self, position, groups, obstacle_sprites, create_attack, destroy_attack, create_magic):
         super().__init__(groups)
-        self.image = pygame.image.load('./graphics/test/player.png').convert_alpha()
+        self.image = assets.image('./graphics/test/player.png')
         self.rect = self.image.get_rect(topleft=position)
         self.hitbox = self.rect.inflate(-6, HITBOX_OFFSET['player'])
 
@@ -63,8 +65,7 @@ class Player(Entity):
         self.invulnerability_duration = 500
 
         # import a sound
-        self.weapon_attack_sound = pygame.mixer.Sound('./audio/sword.wav')
-        self.weapon_attack_sound.set_volume(0.05)
+        self.weapon_attack_sound = assets.sound('./audio/sword.wav', 0.05)
 
     def import_player_assets(self):
         character_path = './graphics/player/'
@@ -84,10 +85,10 @@ class Player(Entity):
         }
         for animation in self.animations.keys():
             full_path = character_path + animation
-            self.animations[animation] = import_folder(full_path)
+            self.animations[animation] = assets.folder(full_path)
 
     def input(self):
-        keys = pygame.key.get_pressed()
+        keys = controls.get_pressed()
 
         if keys[pygame.K_a]:
             self.health = self.stats['health']
@@ -123,14 +124,14 @@ class Player(Entity):
             if keys[pygame.K_z] and not self.exhausted and self.energy > 0:
                 self.attacking = True
                 self.energy = max(self.energy - weapon_data[self.weapon]['energy'], 0)
-                self.attack_time = pygame.time.get_ticks()
+                self.attack_time = timing.get_ticks()
                 self.create_attack()
                 self.weapon_attack_sound.play()
 
             # magic input
             if keys[pygame.K_e] and not self.exhausted:
                 self.attacking = True
-                self.attack_time = pygame.time.get_ticks()
+                self.attack_time = timing.get_ticks()
                 style = list(magic_data.keys())[self.magic_index]
                 strength = list(magic_data.values())[self.magic_index]['strength'] + self.stats['magic']
                 cost = list(magic_data.values())[self.magic_index]['cost']
@@ -141,13 +142,13 @@ class Player(Entity):
             if self.can_switch_weapon:
                 if keys[pygame.K_d] or keys[pygame.K_s]:
                     self.can_switch_weapon = False
-                    self.weapon_switch_time = pygame.time.get_ticks()
+                    self.weapon_switch_time = timing.get_ticks()
                     self.weapon_index += 1 if keys[pygame.K_d] else -1
                     self.weapon_index %= len(list(weapon_data.keys()))
                     self.weapon = list(weapon_data.keys())[self.weapon_index]
                 elif keys[pygame.K_1] or keys[pygame.K_2] or keys[pygame.K_3] or keys[pygame.K_4] or keys[pygame.K_5]:
                     self.can_switch_weapon = False
-                    self.weapon_switch_time = pygame.time.get_ticks()
+                    self.weapon_switch_time = timing.get_ticks()
                     if keys[pygame.K_1]:
                         self.weapon_index = 0
                     if keys[pygame.K_2]:
@@ -164,7 +165,7 @@ class Player(Entity):
             if self.can_switch_magic:
                 if keys[pygame.K_r]:
                     self.can_switch_magic = False
-                    self.magic_switch_time = pygame.time.get_ticks()
+                    self.magic_switch_time = timing.get_ticks()
                     self.magic_index += 1
                     self.magic_index %= len(list(magic_data.keys()))
                     self.magic = list(magic_data.keys())[self.magic_index]
@@ -193,7 +194,7 @@ class Player(Entity):
             self.status = self.orientation
 
     def cooldowns(self):
-        current_time = pygame.time.get_ticks()
+        current_time = timing.get_ticks()
 
         if self.attacking:
             if current_time - self.attack_time >= self.attack_cooldown + weapon_data[self.weapon]['cooldown']:
@@ -228,12 +229,11 @@ class Player(Entity):
         self.image = animation[int(self.frame_index)]
         self.rect = self.image.get_rect(center=self.hitbox.center)
 
-        # flicker
+        # flicker on a copy since the frames are shared
         if not self.vulnerable:
             alpha = self.wave_value()
+            self.image = self.image.copy()
             self.image.set_alpha(alpha)
-        else:
-            self.image.set_alpha(255)
 
     def get_full_weapon_damage(self):
         base_damage = self.stats['attack']
@@ -269,7 +269,7 @@ class Player(Entity):
             if not self.exhausted:
                 self.exhausted_duration += 500
             self.exhausted = True
-            self.exhausted_time = pygame.time.get_ticks()
+            self.exhausted_time = timing.get_ticks()
         elif self.energy == self.stats['energy'] and self.exhausted_duration != 500 and not self.exhausted:
             self.exhausted_duration = 500
 
@@ -293,4 +293,3 @@ class Player(Entity):
         self.check_exhausted()
         self.energy_recovery()
         self.mana_recovery()
-        print(self.health)
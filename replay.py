@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+from time import perf_counter
+
+# the report goes to stdout, pygame's banner has to stay out of it.
+# headless is only imported when replaying, the game imports this module too
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame
+from settings import *
+import controls
+from enemy import Enemy
+
+# every key the simulation reads, the rest of the keyboard is not recorded
+GAME_KEYS = (
+    pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_LSHIFT,
+    pygame.K_z, pygame.K_e, pygame.K_a, pygame.K_d, pygame.K_s, pygame.K_r,
+    pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5)
+VERSION = 1
+
+
+def state_checksum(level):
+    # everything the simulation keeps that a later step can read
+    player = level.player
+    state = [
+        level.game_paused,
+        tuple(player.hitbox),
+        player.health, player.energy, player.mana, player.exp,
+        player.status, player.weapon_index, player.magic_index,
+        sorted(player.stats.items()),
+        sorted(player.upgrade_cost.items())]
+    for sprite in level.visible_sprites.sprites():
+        if isinstance(sprite, Enemy):
+            # health as a float, the component store keeps it in a float column.
+            # the animation frame is left out, sleeping enemies only catch up on it now and then
+            state.append((sprite.monster_name, tuple(sprite.hitbox), float(sprite.health), sprite.status, sprite.can_attack, sprite.vulnerable, tuple(sprite.direction)))
+    state.append(len(level.attackable_sprites))
+    state.append(len(level.visible_sprites.particles))
+    return hashlib.sha1(repr(state).encode()).hexdigest()
+
+
+class InputRecorder:
+    def __init__(self, seed, step=1000 / FPS, interval=REPLAY_CHECKSUM_INTERVAL):
+        self.seed = seed
+        self.step = step
+        self.interval = interval
+
+        # runs of identical steps, as [count, keys, events]
+        self.steps = []
+        self.count = 0
+        self.events = []
+        self.checksums = {}
+        self.keys = controls.ScriptedKeys()
+
+    def event(self, name):
+        # applied before the next step, like the game applies it
+        self.events.append(name)
+
+    def capture(self):
+        # the keyboard is read once per step and the step sees only that
+        pressed = pygame.key.get_pressed()
+        keys = [key for key in GAME_KEYS if pressed[key]]
+        self.keys.pressed = set(keys)
+        controls.use_source(lambda: self.keys)
+
+        if self.steps and not self.events and self.steps[-1][1] == keys:
+            self.steps[-1][0] += 1
+        else:
+            self.steps.append([1, keys, self.events])
+        self.events = []
+        self.count += 1
+
+    def stepped(self, level):
+        if self.count % self.interval == 0:
+            self.checksums[self.count] = state_checksum(level)
+
+    def save(self, path, level):
+        recording = {
+            'version': VERSION,
+            'seed': self.seed,
+            'step': self.step,
+            'frames': self.count,
+            'steps': self.steps,
+            'checksums': self.checksums,
+            'end_checksum': state_checksum(level)}
+        with open(path, 'w') as recording_file:
+            json.dump(recording, recording_file)
+
+
+def load_recording(path):
+    with open(path) as recording_file:
+        recording = json.load(recording_file)
+    if recording.get('version') != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} recording')
+    recording['checksums'] = {int(step): checksum for step, checksum in recording['checksums'].items()}
+    return recording
+
+
+def recorded_steps(recording):
+    # the keys of every step, the events only with the first step of their run
+    for count, pressed, events in recording['steps']:
+        yield pressed, events
+        for _ in range(count - 1):
+            yield pressed, ()
+
+
+def replay(recording, render=False):
+    from headless import HeadlessGame
+    from benchmark import percentile
+
+    game = HeadlessGame(seed=recording['seed'], step=recording['step'], render=render)
+    level = game.level
+    keys = controls.ScriptedKeys()
+    controls.use_source(lambda: keys)
+
+    # the run stops at the first checksum that differs, what follows it can not match
+    frame_times = []
+    mismatch = None
+    frame = 0
+    for pressed, events in recorded_steps(recording):
+        for name in events:
+            if name == 'menu':
+                level.toggle_menu()
+        keys.pressed = set(pressed)
+
+        start = perf_counter()
+        game.step()
+        frame_times.append((perf_counter() - start) * 1000)
+        frame += 1
+
+        expected = recording['checksums'].get(frame)
+        if expected is not None and state_checksum(level) != expected:
+            mismatch = frame
+            break
+
+    controls.use_source(None)
+    end_checksum = state_checksum(level)
+    game.close()
+    return {
+        'frames': frame,
+        'frame_ms': {
+            'mean': sum(frame_times) / len(frame_times) if frame_times else 0,
+            'p95': percentile(frame_times, 95) if frame_times else 0,
+            'p99': percentile(frame_times, 99) if frame_times else 0,
+            'max': max(frame_times, default=0)},
+        'first_mismatch': mismatch,
+        'end_checksum': end_checksum,
+        'matches': mismatch is None and end_checksum == recording['end_checksum']}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Replays a recorded session headless and checks it ends in the recorded state.')
+    parser.add_argument('recording', help='file written by main.py --record')
+    parser.add_argument('--render', action='store_true', help='also draw every frame, as the game did')
+    parser.add_argument('--output', help='file to write the report to instead of stdout')
+    options = parser.parse_args(args)
+
+    report = replay(load_recording(options.recording), options.render)
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+    return 0 if report['matches'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,6 +8,64 @@ HITBOX_OFFSET = {
     'grass': -10,
     'invisible': 0}
 
+# camera
+CAMERA_MARGIN = TILESIZE
+BAKE_STATIC_CHUNKS = True
+STATIC_CHUNK_SIZE = 8
+DIRTY_RECTS = True
+DIRTY_RECT_LIMIT = 24
+
+# enemies
+BATCH_ENEMY_AI = True
+ENEMY_SLEEP = True
+SLEEP_ANIMATION_INTERVAL = 8
+FLOW_FIELD = True
+FLOW_FIELD_RANGE = 12
+ENEMY_COMPONENTS = False
+ENEMY_AI_WORKERS = 0
+ENEMY_AI_PROCESSES = False
+ENEMY_AI_CHUNK = 64
+
+# timing
+MAX_CATCH_UP_STEPS = 5
+RENDER_FPS = 120
+
+# replays
+REPLAY_CHECKSUM_INTERVAL = 60
+
+# assets
+ASSET_CACHE_SIZE = None
+TEXT_CACHE_SIZE = 256
+ASSET_LOAD_WORKERS = 4
+ASSET_REPORT = False
+PRELOAD_ASSETS = (
+    './graphics/player',
+    './graphics/monsters',
+    './graphics/grass',
+    './graphics/objects',
+    './graphics/weapons',
+    './graphics/particles',
+    './graphics/tilemap/ground.png')
+
+# texture atlas, built with python atlas.py
+USE_ATLAS = True
+ATLAS_FOLDER = './graphics/__atlas__'
+ATLAS_SOURCE = './graphics'
+ATLAS_GROUPS = ('player', 'monsters', 'particles', 'grass', 'objects', 'weapons')
+# groups loaded one animation set at a time get a page of their own per set
+ATLAS_SPLIT_GROUPS = ('particles',)
+ATLAS_PAGE_SIZE = 2048
+ATLAS_PADDING = 1
+ATLAS_COMPRESSION = 0
+
+# map
+MAP_CACHE_FOLDER = './map/__mapcache__'
+
+# world streaming
+STREAM_WORLD = False
+STREAM_RADIUS = 2
+FLOOR_CHUNK_FOLDER = './graphics/tilemap/__chunks__'
+
 # ui
 BAR_HEIGHT = 20
 HEALTH_BAR_WIDTH = 200
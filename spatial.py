@@ -0,0 +1,201 @@
+import pygame
+from heapq import heappush, heappop
+from settings import *
+from tile import Tile
+
+
+class SpatialGroup(pygame.sprite.Group):
+    def __init__(self, cell_size=TILESIZE):
+
+        # grid setup
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}
+        self.order = 0
+        self.version = 0
+
+        # walls only block movement, so they are kept as one byte per cell
+        self.walls = bytearray()
+        self.wall_rows = 0
+        self.wall_cols = 0
+        super().__init__()
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        left = rect.left // size
+        top = rect.top // size
+        right = max(rect.right - 1, rect.left) // size
+        bottom = max(rect.bottom - 1, rect.top) // size
+        return left, top, right, bottom
+
+    def set_walls(self, layout):
+        self.wall_rows = layout.rows
+        self.wall_cols = layout.cols
+        self.walls = bytearray(layout.rows * layout.cols)
+        for row, col, _ in layout.non_empty():
+            self.walls[row * layout.cols + col] = 1
+
+    def is_wall(self, col, row):
+        return 0 <= col < self.wall_cols and 0 <= row < self.wall_rows and self.walls[row * self.wall_cols + col] == 1
+
+    def is_blocked(self, col, row):
+        # a cell is blocked when its center is inside a wall or an obstacle
+        if self.is_wall(col, row):
+            return True
+        bucket = self.cells.get((col, row))
+        if bucket:
+            center = ((col + 0.5) * self.cell_size, (row + 0.5) * self.cell_size)
+            for sprite in bucket:
+                if sprite.hitbox.collidepoint(center):
+                    return True
+        return False
+
+    def wall_hitbox(self, col, row):
+        # the same hitbox an invisible tile of the cell would have
+        return pygame.Rect(col * TILESIZE + 1, row * TILESIZE, TILESIZE - 2, TILESIZE)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+
+        # the order mirrors the group iteration order
+        self.order += 1
+        left, top, right, bottom = self.cell_range(sprite.hitbox)
+        cells = [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+        self.entries[sprite] = (self.order, cells)
+        self.version += 1
+        for cell in cells:
+            self.cells.setdefault(cell, {})[sprite] = self.order
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        order, cells = self.entries.pop(sprite)
+        self.version += 1
+        for cell in cells:
+            bucket = self.cells[cell]
+            del bucket[sprite]
+            if not bucket:
+                del self.cells[cell]
+
+    def nearby(self, rect):
+        # yields the hitboxes of the walls and sprites sharing a cell with
+        # rect in group order, the rect can be moved by the caller between two.
+        # walls come before every sprite in row order, with negative orders
+        visited = set()
+        queued = set()
+        heap = []
+        wall_count = len(self.walls)
+        last = -wall_count - 1
+        area = None
+
+        while True:
+            current_area = self.cell_range(rect)
+            if current_area != area:
+                area = current_area
+                left, top, right, bottom = area
+                for y in range(top, bottom + 1):
+                    for x in range(left, right + 1):
+                        if (x, y) in visited:
+                            continue
+                        visited.add((x, y))
+                        if self.is_wall(x, y):
+                            order = y * self.wall_cols + x - wall_count
+                            if order > last:
+                                heappush(heap, (order, None))
+                        bucket = self.cells.get((x, y))
+                        if bucket:
+                            for sprite, order in bucket.items():
+                                if order > last and sprite not in queued:
+                                    queued.add(sprite)
+                                    heappush(heap, (order, sprite))
+
+            if not heap:
+                return
+            last, sprite = heappop(heap)
+            if sprite is None:
+                index = last + wall_count
+                yield self.wall_hitbox(index % self.wall_cols, index // self.wall_cols)
+            else:
+                yield sprite.hitbox
+
+
+class AttackableGroup(pygame.sprite.Group):
+    def __init__(self, cell_size=TILESIZE):
+
+        # grid setup, tiles are indexed once and movers again by the first
+        # query after they tell the group they moved
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}
+        self.movers = {}
+        self.moved_sprites = {}
+        self.order = 0
+        super().__init__()
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        left = rect.left // size
+        top = rect.top // size
+        right = max(rect.right - 1, rect.left) // size
+        bottom = max(rect.bottom - 1, rect.top) // size
+        return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+
+        # the order mirrors the group iteration order, entities join before they have a rect
+        self.order += 1
+        if isinstance(sprite, Tile):
+            self.index(sprite, self.order)
+        else:
+            self.entries[sprite] = (self.order, None, ())
+            self.movers[sprite] = None
+            self.moved_sprites[sprite] = None
+            sprite.attackable_grid = self
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.unindex(sprite)
+        del self.entries[sprite]
+        if sprite in self.movers:
+            del self.movers[sprite]
+            self.moved_sprites.pop(sprite, None)
+            sprite.attackable_grid = None
+
+    def index(self, sprite, order):
+        cells = self.cell_range(sprite.rect)
+        self.entries[sprite] = (order, sprite.rect.copy(), cells)
+        for cell in cells:
+            self.cells.setdefault(cell, {})[sprite] = order
+
+    def unindex(self, sprite):
+        for cell in self.entries[sprite][2]:
+            bucket = self.cells[cell]
+            del bucket[sprite]
+            if not bucket:
+                del self.cells[cell]
+
+    def moved(self, sprite):
+        self.moved_sprites[sprite] = None
+
+    def query(self, rects):
+        if not rects:
+            return []
+
+        # movers that left their indexed rect are moved in the grid first
+        for sprite in self.moved_sprites:
+            order, indexed_rect, _ = self.entries[sprite]
+            if indexed_rect != sprite.rect:
+                self.unindex(sprite)
+                self.index(sprite, order)
+        self.moved_sprites = {}
+
+        # the sprites colliding with each rect, in group order
+        results = []
+        for rect in rects:
+            found = {}
+            for cell in self.cell_range(rect):
+                bucket = self.cells.get(cell)
+                if bucket:
+                    found.update(bucket)
+            results.append([sprite for sprite, _ in sorted(found.items(), key=lambda item: item[1]) if rect.colliderect(sprite.rect)])
+        return results
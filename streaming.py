@@ -0,0 +1,141 @@
+import os
+import pygame
+from settings import *
+from mapcache import EMPTY
+
+# the entity value of the player, who is never unloaded
+PLAYER_ENTITY = 394
+
+
+class FloorChunks:
+    def __init__(self, path, chunk_pixels, folder=FLOOR_CHUNK_FOLDER):
+        self.path = path
+        self.chunk_pixels = chunk_pixels
+        self.folder = folder
+
+        # the whole floor is only kept when the pieces can not be written
+        self.fallback = None
+
+    def piece_path(self, chunk):
+        return os.path.join(self.folder, f'{chunk[0]}_{chunk[1]}.png')
+
+    def prepare(self):
+        # cuts the floor image into one file per chunk, again only when it changed.
+        # maps too large for one image ship the pieces without the source
+        if not os.path.exists(self.path):
+            return
+        stat = os.stat(self.path)
+        stamp = f'{stat.st_mtime_ns} {stat.st_size} {self.chunk_pixels}'
+        stamp_path = os.path.join(self.folder, 'source.txt')
+        try:
+            with open(stamp_path) as stamp_file:
+                if stamp_file.read() == stamp:
+                    return
+        except OSError:
+            pass
+
+        floor = pygame.image.load(self.path).convert()
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            for name in os.listdir(self.folder):
+                if name.endswith('.png'):
+                    os.remove(os.path.join(self.folder, name))
+            size = self.chunk_pixels
+            for y in range(0, floor.get_height(), size):
+                for x in range(0, floor.get_width(), size):
+                    area = pygame.Rect(x, y, size, size).clip(floor.get_rect())
+                    pygame.image.save(floor.subsurface(area), self.piece_path((x // size, y // size)))
+            with open(stamp_path, 'w') as stamp_file:
+                stamp_file.write(stamp)
+        except (OSError, pygame.error):
+            # read only install, the pieces are cut from memory instead
+            self.fallback = floor
+
+    def load(self, chunk):
+        size = self.chunk_pixels
+        if self.fallback:
+            area = pygame.Rect(chunk[0] * size, chunk[1] * size, size, size).clip(self.fallback.get_rect())
+            if not area.width or not area.height:
+                return None
+            return self.fallback.subsurface(area).copy()
+
+        path = self.piece_path(chunk)
+        if not os.path.exists(path):
+            return None
+        return pygame.image.load(path).convert()
+
+
+class WorldStream:
+    def __init__(self, level, layouts, floor_path, chunk_size=STATIC_CHUNK_SIZE, radius=STREAM_RADIUS):
+
+        # the chunks are the ones the static scenery is baked in
+        self.level = level
+        self.layouts = layouts
+        self.chunk_size = chunk_size
+        self.chunk_pixels = chunk_size * TILESIZE
+        self.radius = radius
+        self.chunk_cols = -(-max(layout.cols for layout in layouts.values()) // chunk_size)
+        self.chunk_rows = -(-max(layout.rows for layout in layouts.values()) // chunk_size)
+        self.floor = FloorChunks(floor_path, self.chunk_pixels)
+        self.floor.prepare()
+
+        # live tiles of every loaded chunk and live enemies by their spawn cell
+        self.loaded = {}
+        self.enemies = {}
+
+        # cells that stay empty when their chunk is loaded again
+        self.cut = set()
+        self.dead = set()
+
+    def chunk_of(self, pos):
+        return (int(pos[0]) // self.chunk_pixels, int(pos[1]) // self.chunk_pixels)
+
+    def update(self, player):
+        # chunks are dropped one chunk further out than they are loaded,
+        # so walking along a chunk border does not load it over and over
+        center_x, center_y = self.chunk_of(player.rect.center)
+        for chunk in list(self.loaded):
+            if max(abs(chunk[0] - center_x), abs(chunk[1] - center_y)) > self.radius + 1:
+                self.unload(chunk)
+
+        for y in range(max(center_y - self.radius, 0), min(center_y + self.radius, self.chunk_rows - 1) + 1):
+            for x in range(max(center_x - self.radius, 0), min(center_x + self.radius, self.chunk_cols - 1) + 1):
+                if (x, y) not in self.loaded:
+                    self.load((x, y))
+
+        # enemies die on their own and leave with the chunk they stand in
+        for index, enemy in list(self.enemies.items()):
+            if not enemy.alive():
+                self.dead.add(index)
+                del self.enemies[index]
+            elif self.chunk_of(enemy.rect.center) not in self.loaded:
+                del self.enemies[index]
+                enemy.kill()
+
+    def load(self, chunk):
+        sprites = []
+        size = self.chunk_size
+        for style, layout in self.layouts.items():
+            if style == 'boundary':
+                continue
+            for row in range(chunk[1] * size, min((chunk[1] + 1) * size, layout.rows)):
+                for col in range(chunk[0] * size, min((chunk[0] + 1) * size, layout.cols)):
+                    value = layout.value(row, col)
+                    index = row * layout.cols + col
+                    if value == EMPTY or (style == 'grass' and index in self.cut):
+                        continue
+                    if style == 'entities':
+                        if value != PLAYER_ENTITY and index not in self.dead and index not in self.enemies:
+                            self.enemies[index] = self.level.create_cell(style, col * TILESIZE, row * TILESIZE, value)
+                        continue
+                    sprites.append((style, index, self.level.create_cell(style, col * TILESIZE, row * TILESIZE, value)))
+        self.loaded[chunk] = sprites
+        self.level.visible_sprites.set_floor_chunk(chunk, self.floor.load(chunk))
+
+    def unload(self, chunk):
+        for style, index, sprite in self.loaded.pop(chunk):
+            if sprite.alive():
+                sprite.kill()
+            elif style == 'grass':
+                self.cut.add(index)
+        self.level.visible_sprites.set_floor_chunk(chunk, None)
@@ -11,13 +11,13 @@ def import_csv_layout(path):
             terrain_map.append(list(row))
         return terrain_map
 
-def import_folder(path):
+def import_folder(path, load=pygame.image.load):
     surface_list = []
 
     for _, __, img_files in walk(path):
-        for image in img_files:
+        for image in sorted(img_files):
             full_path = path + '/' + image
-            image_surface = pygame.image.load(full_path).convert_alpha()
+            image_surface = load(full_path).convert_alpha()
             surface_list.append(image_surface)
 
     return surface_list
\ No newline at end of file
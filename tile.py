@@ -3,7 +3,7 @@ from settings import *
 
 class Tile(pygame.sprite.Sprite):
     def __init__(self, position, groups, sprite_type, surface = pygame.Surface((TILESIZE, TILESIZE))):
-        super().__init__(groups)
+        super().__init__()
         self.sprite_type = sprite_type
         y_offset = HITBOX_OFFSET[sprite_type]
         self.image = surface
@@ -12,3 +12,6 @@ class Tile(pygame.sprite.Sprite):
         else:
             self.rect = self.image.get_rect(topleft = position)
         self.hitbox = self.rect.inflate(-2, y_offset)
+
+        # the hitbox has to exist before joining a spatial group
+        self.add(groups)
@@ -0,0 +1,29 @@
+import pygame
+from settings import *
+
+
+class FixedClock:
+    def __init__(self, step=1000 / FPS, start=0):
+        self.step = step
+        self.time = start
+
+    def get_ticks(self):
+        return int(self.time)
+
+    def advance(self, frames=1):
+        self.time += self.step * frames
+
+
+# pygame's own clock unless a fixed clock is installed
+clock = None
+
+
+def use_clock(new_clock):
+    global clock
+    clock = new_clock
+
+
+def get_ticks():
+    if clock is None:
+        return pygame.time.get_ticks()
+    return clock.get_ticks()
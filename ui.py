@@ -1,5 +1,6 @@
 import pygame
 from settings import *
+from assets import assets, TextCache
 
 
 class UI:
@@ -7,73 +8,123 @@ class UI:
         # general
         self.display_surface = pygame.display.get_surface()
         self.font = pygame.font.Font(UI_FONT, UI_FONT_SIZE)
+        self.text = TextCache(self.font)
+
+        # elements are drawn once on their own surface and blitted after that
+        self.bars = {}
+        self.exp_box = None
+        self.boxes = {}
 
         # bar setup
         self.health_bar_rect = pygame.Rect(10, 10, HEALTH_BAR_WIDTH, BAR_HEIGHT)
         self.energy_bar_rect = pygame.Rect(10, 34, ENERGY_BAR_WIDTH, BAR_HEIGHT)
         self.mana_bar_rect = pygame.Rect(10, 58, MANA_BAR_WIDTH, BAR_HEIGHT)
 
+        # what every element showed when the dirty rects were last asked for
+        self.shown = {}
+
         # convert weapon dictionary
         self.weapon_graphics = []
         for weapon in weapon_data.values():
             path = weapon['graphic']
-            weapon = pygame.image.load(path).convert_alpha()
+            weapon = assets.image(path)
             self.weapon_graphics.append(weapon)
             
         # convert magic dictionary
         self.magic_graphics = []
         for magic in magic_data.values():
             path = magic['graphic']
-            magic = pygame.image.load(path).convert_alpha()
+            magic = assets.image(path)
             self.magic_graphics.append(magic)
 
     def show_bar(self, current, max_amount, bg_rect, color):
-        # draw background
-        pygame.draw.rect(self.display_surface, UI_BG_COLOR, bg_rect)
-
         # converting stat to pixel
         ratio = current / max_amount
         current_width = bg_rect.width * ratio
         current_rect = bg_rect.copy()
         current_rect.width = current_width
 
-        # drawing the bar
-        pygame.draw.rect(self.display_surface, color, current_rect)
-        pygame.draw.rect(self.display_surface, UI_BORDER_COLOR, bg_rect, 3)
+        # the bar is only drawn again when its filled width changes
+        shown = self.bars.get(bg_rect.topleft)
+        if shown is None or shown[0] != current_rect.width:
+            bar_surf = pygame.Surface(bg_rect.size).convert()
+            local_rect = bar_surf.get_rect()
+            pygame.draw.rect(bar_surf, UI_BG_COLOR, local_rect)
+            pygame.draw.rect(bar_surf, color, current_rect.move(-bg_rect.x, -bg_rect.y))
+            pygame.draw.rect(bar_surf, UI_BORDER_COLOR, local_rect, 3)
+            shown = self.bars[bg_rect.topleft] = (current_rect.width, bar_surf)
+
+        self.display_surface.blit(shown[1], bg_rect)
 
     def show_exp(self, exp):
-        text_surf = self.font.render(str(int(exp)), False, TEXT_COLOR)
-        (x, y) = (self.display_surface.get_size()[0] - 20, self.display_surface.get_size()[1] - 20)
-        text_rect = text_surf.get_rect(bottomright=(x, y))
+        text = str(int(exp))
+        if self.exp_box is None or self.exp_box[0] != text:
+            text_surf = self.text.render(text, TEXT_COLOR)
+            box_rect = text_surf.get_rect().inflate(20, 20)
+            box_surf = pygame.Surface(box_rect.size).convert()
+            local_rect = box_surf.get_rect()
+            pygame.draw.rect(box_surf, UI_BG_COLOR, local_rect)
+            box_surf.blit(text_surf, (10, 10))
+            pygame.draw.rect(box_surf, UI_BORDER_COLOR, local_rect, 3)
+            self.exp_box = (text, box_surf)
 
-        pygame.draw.rect(self.display_surface, UI_BG_COLOR, text_rect.inflate(20, 20))
-        self.display_surface.blit(text_surf, text_rect)
-        pygame.draw.rect(self.display_surface, UI_BORDER_COLOR, text_rect.inflate(20, 20), 3)
+        (x, y) = (self.display_surface.get_size()[0] - 20, self.display_surface.get_size()[1] - 20)
+        box_rect = self.exp_box[1].get_rect(bottomright=(x + 10, y + 10))
+        self.display_surface.blit(self.exp_box[1], box_rect)
 
-    def selection_box(self, left, top, has_switched):
+    def selection_box(self, left, top, has_switched, graphic):
         bg_rect = pygame.Rect(left, top, ITEM_BOX_SIZE, ITEM_BOX_SIZE)
-        pygame.draw.rect(self.display_surface, UI_BG_COLOR, bg_rect)
-        if has_switched:
-            pygame.draw.rect(self.display_surface, UI_BORDER_COLOR_ACTIVE, bg_rect, 3)
-        else:
-            pygame.draw.rect(self.display_surface, UI_BORDER_COLOR, bg_rect, 3)
+
+        # one surface per graphic and border, there are only a few of them
+        key = (graphic, has_switched)
+        box_surf = self.boxes.get(key)
+        if box_surf is None:
+            box_surf = pygame.Surface(bg_rect.size).convert()
+            local_rect = box_surf.get_rect()
+            pygame.draw.rect(box_surf, UI_BG_COLOR, local_rect)
+            if has_switched:
+                pygame.draw.rect(box_surf, UI_BORDER_COLOR_ACTIVE, local_rect, 3)
+            else:
+                pygame.draw.rect(box_surf, UI_BORDER_COLOR, local_rect, 3)
+            box_surf.blit(graphic, graphic.get_rect(center=local_rect.center))
+            self.boxes[key] = box_surf
+
+        self.display_surface.blit(box_surf, bg_rect)
         return bg_rect
 
     def weapon_overlay(self, weapon_index, has_switched):
-        bg_rect = self.selection_box(10, 630, has_switched)  # weapon
-        weapon_surf = self.weapon_graphics[weapon_index]
-        weapon_rect = weapon_surf.get_rect(center=bg_rect.center)
-
-        self.display_surface.blit(weapon_surf, weapon_rect)
-
+        self.selection_box(10, 630, has_switched, self.weapon_graphics[weapon_index])  # weapon
 
     def magic_overlay(self, magic_index, has_switched):
-        bg_rect = self.selection_box(100, 630, has_switched)  # magic
-        magic_surf = self.magic_graphics[magic_index]
-        magic_rect = magic_surf.get_rect(center=bg_rect.center)
+        self.selection_box(100, 630, has_switched, self.magic_graphics[magic_index])  # magic
 
-        self.display_surface.blit(magic_surf, magic_rect)
 
+    def exp_rect(self, exp):
+        (x, y) = (self.display_surface.get_size()[0] - 20, self.display_surface.get_size()[1] - 20)
+        text_rect = self.text.render(str(int(exp)), TEXT_COLOR).get_rect(bottomright=(x, y))
+        return text_rect.inflate(20, 20)
+
+    def dirty_rects(self, player):
+        elements = {
+            'health': ((player.health, player.stats['health']), self.health_bar_rect),
+            'energy': ((player.energy, player.stats['energy']), self.energy_bar_rect),
+            'mana': ((player.mana, player.stats['mana']), self.mana_bar_rect),
+            'exp': (int(player.exp), self.exp_rect(player.exp)),
+            'weapon': ((player.weapon_index, player.can_switch_weapon), pygame.Rect(10, 630, ITEM_BOX_SIZE, ITEM_BOX_SIZE)),
+            'magic': ((player.magic_index, player.can_switch_magic), pygame.Rect(100, 630, ITEM_BOX_SIZE, ITEM_BOX_SIZE))}
+
+        rects = []
+        for name, (state, rect) in elements.items():
+            shown = self.shown.get(name)
+            if shown is None or shown[0] != state:
+                rects.append(rect)
+                if shown is not None:
+                    rects.append(shown[1])
+                self.shown[name] = (state, rect)
+        return rects
+
+    def element_rects(self):
+        return [rect for _, rect in self.shown.values()]
 
     def display(self, player):
         self.show_bar(player.health, player.stats['health'], self.health_bar_rect, HEALTH_COLOR)
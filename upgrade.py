@@ -1,5 +1,8 @@
 import pygame
 from settings import *
+from assets import TextCache
+import timing
+import controls
 
 
 class Upgrade:
@@ -12,6 +15,7 @@ class Upgrade:
         self.attribute_number = len(player.stats)
         self.max_values = list(player.max_stats.values())
         self.font = pygame.font.Font(UI_FONT, UI_FONT_SIZE)
+        self.text = TextCache(self.font)
 
         # item dimensions
         self.height = self.display_surface.get_size()[1] * 0.8
@@ -23,29 +27,30 @@ class Upgrade:
         self.selection_time = None
         self.selection_duration = 200
         self.can_move = True
+        self.shown_items = [None] * self.attribute_number
 
     def input(self):
-        keys = pygame.key.get_pressed()
+        keys = controls.get_pressed()
         if self.can_move:
             if keys[pygame.K_RIGHT]:
                 self.selection_index += 1
                 self.selection_index %= self.attribute_number
                 self.can_move = False
-                self.selection_time = pygame.time.get_ticks()
+                self.selection_time = timing.get_ticks()
             elif keys[pygame.K_LEFT]:
                 self.selection_index -= 1
                 self.selection_index %= self.attribute_number
                 self.can_move = False
-                self.selection_time = pygame.time.get_ticks()
+                self.selection_time = timing.get_ticks()
 
             if keys[pygame.K_UP]:
                 self.can_move = False
-                self.selection_time = pygame.time.get_ticks()
+                self.selection_time = timing.get_ticks()
                 self.item_list[self.selection_index].trigger(self.player)
 
     def selection_cooldown(self):
         if not self.can_move:
-            current_time = pygame.time.get_ticks()
+            current_time = timing.get_ticks()
             if current_time - self.selection_time >= self.selection_duration:
                 self.can_move = True
 
@@ -62,13 +67,33 @@ class Upgrade:
 
             # create the object
 
-            new_item = Item(left, top, self.width, self.height, index, self.font)
+            new_item = Item(left, top, self.width, self.height, index, self.text)
             self.item_list.append(new_item)
 
-    def display(self):
+    def update(self):
         self.input()
         self.selection_cooldown()
 
+    def dirty_rects(self, shown):
+        # an item is redrawn when anything it shows changes, or the menu opens or closes
+        items = []
+        for index, item in enumerate(self.item_list):
+            state = None
+            if shown:
+                state = (self.selection_index == index, self.player.get_value_by_index(index), self.player.get_cost_by_index(index))
+            items.append(state)
+        rects = [item.rect.inflate(2, 2) for item, state, last in zip(self.item_list, items, self.shown_items) if state != last]
+        self.shown_items = items
+        return rects
+
+    def element_rects(self):
+        return [item.rect.inflate(2, 2) for item, state in zip(self.item_list, self.shown_items) if state is not None]
+
+    def display(self):
+        self.update()
+        self.draw()
+
+    def draw(self):
         for index,item in enumerate(self.item_list):
 
             # get attributes
@@ -80,30 +105,34 @@ class Upgrade:
 
 
 class Item:
-    def __init__(self, left, top, width, height, index, font):
+    def __init__(self, left, top, width, height, index, text):
         self.rect = pygame.Rect(left, top, width, height)
         self.index = index
-        self.font = font
+        self.text = text
 
-    def display_names(self, surface, name, cost, selected):
+        # the panel is drawn again only when something it shows changes
+        self.shown = None
+        self.panel = None
+
+    def display_names(self, surface, rect, name, cost, selected):
 
         # title
-        title_surf = self.font.render(name, False, TEXT_COLOR_SELECTED if selected else TEXT_COLOR)
-        title_rect = title_surf.get_rect(midtop=self.rect.midtop + pygame.math.Vector2(0, 20))
+        title_surf = self.text.render(name, TEXT_COLOR_SELECTED if selected else TEXT_COLOR)
+        title_rect = title_surf.get_rect(midtop=rect.midtop + pygame.math.Vector2(0, 20))
 
         # cost
-        cost_surf = self.font.render(f'{int(cost)}', False, TEXT_COLOR_SELECTED if selected else TEXT_COLOR)
-        cost_rect = title_surf.get_rect(midbottom=self.rect.midbottom + pygame.math.Vector2(0, -20))
+        cost_surf = self.text.render(f'{int(cost)}', TEXT_COLOR_SELECTED if selected else TEXT_COLOR)
+        cost_rect = title_surf.get_rect(midbottom=rect.midbottom + pygame.math.Vector2(0, -20))
 
         # draw
         surface.blit(title_surf, title_rect)
         surface.blit(cost_surf, cost_rect)
 
-    def display_bar(self, surface, value, max_value, selected):
+    def display_bar(self, surface, rect, value, max_value, selected):
 
         # drawing setup
-        top = self.rect.midtop + pygame.math.Vector2(0, 60)
-        bottom = self.rect.midbottom + pygame.math.Vector2(0, -60)
+        top = rect.midtop + pygame.math.Vector2(0, 60)
+        bottom = rect.midbottom + pygame.math.Vector2(0, -60)
         color = BAR_COLOR_SELECTED if selected else BAR_COLOR
 
         # bar setup
@@ -123,13 +152,23 @@ class Item:
             player.stats[upgrade_attribute] = min(player.stats[upgrade_attribute]*1.2, player.max_stats[upgrade_attribute])
             player.upgrade_cost[upgrade_attribute] *= 1.4
 
-    def display(self, surface, selection_number, name, value, max_value, cost):
-        if self.index == selection_number:
-            pygame.draw.rect(surface, UPGRADE_BG_COLOR_SELECTED, self.rect)
-            pygame.draw.rect(surface, UI_BORDER_COLOR, self.rect, 4)
+    def render_panel(self, selected, name, value, max_value, cost):
+        panel = pygame.Surface(self.rect.size).convert()
+        rect = panel.get_rect()
+        if selected:
+            pygame.draw.rect(panel, UPGRADE_BG_COLOR_SELECTED, rect)
+            pygame.draw.rect(panel, UI_BORDER_COLOR, rect, 4)
         else:
-            pygame.draw.rect(surface, UI_BG_COLOR, self.rect)
-            pygame.draw.rect(surface, UI_BORDER_COLOR, self.rect, 4)
+            pygame.draw.rect(panel, UI_BG_COLOR, rect)
+            pygame.draw.rect(panel, UI_BORDER_COLOR, rect, 4)
 
-        self.display_names(surface, name, cost, self.index == selection_number)
-        self.display_bar(surface, value, max_value, self.index == selection_number)
+        self.display_names(panel, rect, name, cost, selected)
+        self.display_bar(panel, rect, value, max_value, selected)
+        return panel
+
+    def display(self, surface, selection_number, name, value, max_value, cost):
+        shown = (self.index == selection_number, name, value, max_value, cost)
+        if shown != self.shown:
+            self.panel = self.render_panel(*shown)
+            self.shown = shown
+        surface.blit(self.panel, self.rect)
@@ -1,4 +1,5 @@
 import pygame
+from assets import assets
 
 
 class Weapon(pygame.sprite.Sprite):
@@ -9,7 +10,7 @@ class Weapon(pygame.sprite.Sprite):
 
         # graphic
         full_path = f'./graphics/weapons/{player.weapon}/{orientation}.png'
-        self.image = pygame.image.load(full_path).convert_alpha()
+        self.image = assets.image(full_path)
 
         # placement
         if orientation == 'right':